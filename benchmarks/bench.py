@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+"""Benchmark of report stages on synthetic data and fake TestRail.
+
+Times xUnit report parsing, cases mapping, results filling (comments
+rendering) and full `report` command against in-process fake TestRail
+(with optional latency and 429 responses). Each benchmark is run
+`--repeat` times and the best time is taken.
+
+Results can be saved as baseline and compared with it later: benchmarks
+slower than baseline by more than `--tolerance` are reported as
+regressions (and exit code is 1). Baselines are stored per scenario (data
+sizes and fake TestRail settings), so runs with other sizes don't clash.
+
+Usage: python benchmarks/bench.py [--xunit-cases 10000]
+                                  [--testrail-cases 10000]
+                                  [--baseline benchmarks/baseline.json]
+                                  [--save-baseline]
+"""
+from __future__ import print_function
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from fake_testrail import FakeTestRail
+from fake_testrail import STATUSES
+import synthetic
+from xunit2testrail import cmd
+from xunit2testrail.reporter import Reporter
+from xunit2testrail.testrail.client import Case
+from xunit2testrail.utils import TemplateCaseMapper
+
+BENCHMARKS = ('parse', 'map', 'fill', 'main')
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def make_mapper():
+    return TemplateCaseMapper(xunit_name_template=u'{id}',
+                              testrail_name_template=u'{custom_report_label}')
+
+
+def parse_report(path):
+    # same parser and options as in reporter
+    reporter = Reporter(xunit_report=path, env_description='benchmark',
+                        test_results_link='', case_mapper=None,
+                        paste_url=None)
+    return reporter.get_xunit_test_suite()[0]
+
+
+def make_reporter(path, cases):
+    reporter = Reporter(xunit_report=path, env_description='benchmark',
+                        test_results_link='http://jenkins/job/1/',
+                        case_mapper=make_mapper(), paste_url=None)
+    reporter.config_testrail(base_url='http://testrail', username='user',
+                             password='password', milestone='1.0',
+                             project='Project', tests_suite='Suite',
+                             plan_name='plan', send_skipped=True)
+    reporter._cache['cases'] = cases
+    reporter._cache['testrail_statuses'] = {x['id']: x['name']
+                                            for x in STATUSES}
+    return reporter
+
+
+def run_main(args, fake, report_path, plan_name):
+    argv = ['--testrail-url', fake.url, '--testrail-project', 'Project',
+            '--testrail-milestone', '1.0', '--testrail-suite', 'Suite',
+            '--testrail-plan-name', plan_name, '--send-skipped',
+            '--env-description', 'benchmark', report_path]
+    if args.testrail_async and sys.version_info >= (3, 5):
+        argv.append('--testrail-async')
+    with contextlib.redirect_stdout(io.StringIO()):
+        cmd.main(argv)
+
+
+def run_benchmarks(args, report_path):
+    results = {}
+    cases_data = synthetic.make_cases_data(args.testrail_cases,
+                                           args.custom_fields)
+    cases = [Case(**x) for x in cases_data]
+
+    if 'parse' in args.only:
+        results['parse'] = best_time(lambda: parse_report(report_path),
+                                     args.repeat)
+
+    xunit_suite = parse_report(report_path)
+    if 'map' in args.only:
+        # new mapper each time, as it keeps index of last cases
+        results['map'] = best_time(
+            lambda: make_mapper().map(xunit_suite, cases), args.repeat)
+
+    if 'fill' in args.only:
+        reporter = make_reporter(report_path, cases)
+        mapping = reporter.map_cases(xunit_suite)
+        results['fill'] = best_time(
+            lambda: reporter.fill_case_results(mapping), args.repeat)
+
+    if 'main' in args.only:
+        fake = FakeTestRail(cases_data, latency=args.latency,
+                            throttle_every=args.throttle_every,
+                            retry_after=args.retry_after)
+        plan_names = ('plan {}'.format(i) for i in range(args.repeat))
+        with fake:
+            results['main'] = best_time(
+                lambda: run_main(args, fake, report_path, next(plan_names)),
+                args.repeat)
+        results['main_requests'] = fake.requests // args.repeat
+    return results
+
+
+def scenario_key(args):
+    return ('xunit={0.xunit_cases} testrail={0.testrail_cases} '
+            'custom={0.custom_fields} stdout={0.stdout_size} '
+            'trace={0.trace_size} latency={0.latency} '
+            'throttle={0.throttle_every}').format(args)
+
+
+def compare(results, baseline, tolerance):
+    """Return list of (name, time, baseline time) of regressed benchmarks."""
+    regressions = []
+    for name in BENCHMARKS:
+        if name in results and name in baseline:
+            if results[name] > baseline[name] * (1 + tolerance):
+                regressions.append((name, results[name], baseline[name]))
+    return regressions
+
+
+def load_json(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--xunit-cases', type=int, default=10000)
+    parser.add_argument('--testrail-cases', type=int, default=10000)
+    parser.add_argument('--custom-fields', type=int, default=30,
+                        help='custom fields of each TestRail case')
+    parser.add_argument('--stdout-size', type=int, default=0,
+                        help='chars of stdout of each xUnit case')
+    parser.add_argument('--trace-size', type=int, default=2000,
+                        help='chars of trace of each unsuccessful case')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='seconds of fake TestRail response delay')
+    parser.add_argument('--throttle-every', type=int, default=0,
+                        help='answer each N-th request with 429')
+    parser.add_argument('--retry-after', type=float, default=0.1,
+                        help='Retry-After seconds of 429 responses')
+    parser.add_argument('--testrail-async', action='store_true',
+                        default=False, help='run report with --testrail-async')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS,
+                        default=BENCHMARKS, help='benchmarks to run')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true',
+                        default=False,
+                        help='save results as baseline for scenario')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown relative to baseline')
+    parser.add_argument('--output', help='save results to JSON file')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        report_path = os.path.join(tmp_dir, 'report.xml')
+        synthetic.write_xunit_report(report_path, args.xunit_cases,
+                                     stdout_size=args.stdout_size,
+                                     trace_size=args.trace_size)
+        results = run_benchmarks(args, report_path)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    key = scenario_key(args)
+    baselines = load_json(args.baseline)
+    baseline = baselines.get(key, {})
+    print('Scenario: {}'.format(key))
+    for name in BENCHMARKS:
+        if name in results:
+            line = '{:8} {:10.3f}s'.format(name, results[name])
+            if name in baseline:
+                line += '  (baseline {:.3f}s, {:+.0%})'.format(
+                    baseline[name], results[name] / baseline[name] - 1)
+            print(line)
+    if 'main_requests' in results:
+        print('TestRail requests per report: {}'.format(
+            results['main_requests']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({key: results}, f, indent=2)
+    if args.save_baseline and args.baseline:
+        baselines[key] = results
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print('Baseline is saved to {}'.format(args.baseline))
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for name, seconds, base in regressions:
+        print('REGRESSION: {} {:.3f}s > baseline {:.3f}s'.format(
+            name, seconds, base))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Benchmark of memory usage and attribute access of TestRail items.
+
+Compares slots based `Case` with previous `_data` dict based item.
+
+Usage: python benchmarks/bench_items.py [--cases 40000]
+"""
+from __future__ import print_function
+
+import argparse
+import timeit
+import tracemalloc
+
+from synthetic import make_cases_data
+from xunit2testrail.testrail.client import Case
+
+
+class LegacyItem(object):
+    """Previous Item implementation (all fields in `_data` dict)."""
+
+    def __init__(self, id=None, **kwargs):
+        self.id = id
+        self._data = kwargs
+
+    def __getattr__(self, name):
+        if name in self._data:
+            return self._data[name]
+        else:
+            raise AttributeError
+
+    def __setattr__(self, name, value):
+        if '_data' in self.__dict__ and name not in self.__dict__:
+            self.__dict__['_data'][name] = value
+        else:
+            self.__dict__[name] = value
+
+
+class LegacyCase(LegacyItem):
+    def __init__(self, *args, **kwargs):
+        super(LegacyCase, self).__init__(*args, **kwargs)
+        self.result = None
+
+
+def measure_memory(item_class, cases_data):
+    tracemalloc.start()
+    items = [item_class(**x) for x in cases_data]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return items, size
+
+
+def read_fields(items):
+    return [(x.title, x.suite_id, x.custom_field_7) for x in items]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, default=40000)
+    args = parser.parse_args()
+
+    cases_data = make_cases_data(args.cases)
+    for name, item_class in (('legacy', LegacyCase), ('slots', Case)):
+        items, size = measure_memory(item_class, cases_data)
+        access = timeit.timeit(lambda: read_fields(items), number=5) / 5
+        print('{:8} memory: {:8.1f} MiB, access: {:6.3f}s'.format(
+            name, size / 1024.0 / 1024, access))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""Benchmark of TemplateCaseMapper on big synthetic suites.
+
+Legacy (not indexed) matcher is O(xunit x testrail), so it is timed only on
+a sample of xUnit cases and extrapolated to the full report size.
+
+Usage: python benchmarks/bench_mapping.py [--testrail-cases 40000]
+                                          [--xunit-cases 15000]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+from synthetic import make_testrail_cases
+from synthetic import make_xunit_cases
+from xunit2testrail.utils import TemplateCaseMapper
+
+# reference implementations are shared with tests
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'tests'))
+from reference import legacy_suitable_cases  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--testrail-cases', type=int, default=40000)
+    parser.add_argument('--xunit-cases', type=int, default=15000)
+    parser.add_argument('--legacy-sample', type=int, default=20,
+                        help='xUnit cases to time legacy matcher on')
+    args = parser.parse_args()
+
+    mapper = TemplateCaseMapper(
+        xunit_name_template=u'{id}',
+        testrail_name_template=u'{custom_report_label}')
+    testrail_cases = make_testrail_cases(args.testrail_cases)
+    xunit_cases = make_xunit_cases(args.xunit_cases)
+
+    start = time.time()
+    mapping = mapper.map(xunit_cases, testrail_cases)
+    indexed = time.time() - start
+
+    sample = xunit_cases[:args.legacy_sample]
+    start = time.time()
+    for xunit_case in sample:
+        legacy_suitable_cases(mapper, xunit_case, testrail_cases)
+    legacy = (time.time() - start) / len(sample) * len(xunit_cases)
+
+    print('TestRail cases: {}, xUnit cases: {}, mapped: {}'.format(
+        len(testrail_cases), len(xunit_cases), len(mapping)))
+    print('indexed map:   {:10.2f}s'.format(indexed))
+    print('legacy map:    {:10.2f}s (extrapolated from {} cases)'.format(
+        legacy, len(sample)))
+    print('speedup:       {:10.0f}x'.format(legacy / indexed))
+
+
+if __name__ == '__main__':
+    main()
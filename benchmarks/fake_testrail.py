@@ -0,0 +1,250 @@
+"""In-process fake TestRail API server for benchmarks.
+
+Serves one project with one milestone and given suites and cases and
+keeps plans, runs, tests and results, created by reporter, in memory.
+Bulk lists are paginated as by TestRail 6.7+. Each response can be delayed
+by `latency` seconds and each `throttle_every`-th request is answered with
+429 status and `Retry-After` header.
+"""
+from __future__ import absolute_import
+
+import itertools
+import json
+import threading
+import time
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+from six.moves.urllib import parse
+
+STATUSES = [{'id': 1, 'name': 'passed'}, {'id': 2, 'name': 'blocked'},
+            {'id': 3, 'name': 'untested'}, {'id': 4, 'name': 'retest'},
+            {'id': 5, 'name': 'failed'}, {'id': 6, 'name': 'skipped'}]
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # keep connections alive, as TestRail does
+    protocol_version = 'HTTP/1.1'
+    # don't delay small responses (Python 3)
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, data, headers = self.server.fake.handle(method, self.path,
+                                                        body)
+        content = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+
+class FakeTestRail(object):
+    """Fake TestRail, listening on random local port.
+
+    :param cases: cases data (e.g. `synthetic.make_cases_data()`); cases
+        without `suite_id` belong to first suite
+    :param suites: suites names (their ids are 1, 2, ...)
+    :param latency: seconds to wait before each response
+    :param throttle_every: answer each N-th request with 429 (0 - never)
+    :param retry_after: `Retry-After` seconds of 429 responses
+    :param page_size: max number of items in bulk list page
+    """
+
+    def __init__(self, cases, project='Project', milestone='1.0',
+                 suites=('Suite', ), latency=0, throttle_every=0,
+                 retry_after=1, page_size=250):
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.page_size = page_size
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.projects = [{'id': 1, 'name': project}]
+        self.milestones = [{'id': 1, 'name': milestone, 'project_id': 1}]
+        self.suites = [{'id': i, 'name': name, 'project_id': 1}
+                       for i, name in enumerate(suites, 1)]
+        self.cases = [dict(x, suite_id=x.get('suite_id', 1)) for x in cases]
+        self.sections = []
+        self.plans = {}
+        self.runs = {}
+        self.tests = {}
+        self.results = {}
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        self.server.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://{}:{}/'.format(*self.server.server_address)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def handle(self, method, path, body):
+        """Return status, response data and headers for API request."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            throttled = self.throttle_every and not (
+                self.requests % self.throttle_every)
+        if throttled:
+            return (429, {'error': 'API Rate Limit Exceeded'},
+                    [('Retry-After', str(self.retry_after))])
+        # path is like /index.php?/api/v2/get_cases/1&suite_id=1
+        query = parse.urlsplit(path).query
+        api, _, params = query.partition('&')
+        params = dict(parse.parse_qsl(params))
+        name_args = api.split('/api/v2/', 1)[-1].split('/')
+        handler = getattr(self, 'api_' + name_args[0], None)
+        if handler is None:
+            return 400, {'error': 'Unknown method ' + name_args[0]}, []
+        data = json.loads(body.decode('utf-8')) if body else None
+        with self._lock:
+            return 200, handler(params, data, *name_args[1:]), []
+
+    def _new_id(self):
+        return next(self._ids)
+
+    def _page(self, name, items, params, url):
+        offset = int(params.pop('offset', 0))
+        limit = int(params.pop('limit', self.page_size))
+        page = items[offset:offset + limit]
+        next_url = None
+        if offset + limit < len(items):
+            url += ''.join('&{}={}'.format(k, v) for k, v in params.items())
+            next_url = '/api/v2/{}&offset={}&limit={}'.format(
+                url, offset + limit, limit)
+        return {'offset': offset, 'limit': limit, 'size': len(page),
+                '_links': {'next': next_url, 'prev': None}, name: page}
+
+    def api_get_statuses(self, params, data):
+        return STATUSES
+
+    def api_get_projects(self, params, data):
+        return self._page('projects', self.projects, params, 'get_projects')
+
+    def api_get_project(self, params, data, project_id):
+        return self.projects[0]
+
+    def api_get_milestones(self, params, data, project_id):
+        return self._page('milestones', self.milestones, params,
+                          'get_milestones/' + project_id)
+
+    def api_get_suites(self, params, data, project_id):
+        return self.suites
+
+    def api_get_configs(self, params, data, project_id):
+        return []
+
+    def api_get_cases(self, params, data, project_id):
+        suite_id = int(params.get('suite_id', 1))
+        cases = [x for x in self.cases if x['suite_id'] == suite_id]
+        updated_after = int(params.get('updated_after', 0))
+        if updated_after:
+            cases = [x for x in cases if x['updated_on'] > updated_after]
+        return self._page('cases', cases, params, 'get_cases/' + project_id)
+
+    def api_get_sections(self, params, data, project_id):
+        return self._page('sections', self.sections, params,
+                          'get_sections/' + project_id)
+
+    def api_add_section(self, params, data, project_id):
+        section = dict(data, id=self._new_id(),
+                       suite_id=data.get('suite_id', 1))
+        self.sections.append(section)
+        return section
+
+    def api_add_case(self, params, data, section_id):
+        section = [x for x in self.sections if x['id'] == int(section_id)]
+        case = dict(data, id=self._new_id(), suite_id=section[0]['suite_id'],
+                    section_id=int(section_id), updated_on=int(time.time()))
+        self.cases.append(case)
+        return case
+
+    def api_get_plans(self, params, data, project_id):
+        plans = [{k: v for k, v in x.items() if k != 'entries'}
+                 for x in self.plans.values()]
+        return self._page('plans', plans, params, 'get_plans/' + project_id)
+
+    def api_get_plan(self, params, data, plan_id):
+        return self.plans[int(plan_id)]
+
+    def api_add_plan(self, params, data, project_id):
+        plan_id = self._new_id()
+        plan = dict(data, id=plan_id, project_id=int(project_id),
+                    entries=[], url='{}plans/view/{}'.format(self.url,
+                                                             plan_id))
+        self.plans[plan_id] = plan
+        for entry in data.get('entries', []):
+            self.api_add_plan_entry(params, entry, str(plan_id))
+        return plan
+
+    def api_add_plan_entry(self, params, data, plan_id):
+        entry = {'id': str(self._new_id()), 'suite_id': data['suite_id'],
+                 'name': data['name'], 'runs': []}
+        for run_data in data['runs']:
+            run_id = self._new_id()
+            run = dict(run_data, id=run_id, suite_id=data['suite_id'],
+                       plan_id=int(plan_id), entry_id=entry['id'],
+                       include_all=data.get('include_all', False),
+                       url='{}runs/view/{}'.format(self.url, run_id))
+            self.runs[run_id] = run
+            self.tests[run_id] = [
+                {'id': self._new_id(), 'case_id': case_id, 'status_id': 3,
+                 'run_id': run_id} for case_id in run.pop('case_ids', [])]
+            self.results[run_id] = []
+            entry['runs'].append(run)
+        self.plans[int(plan_id)]['entries'].append(entry)
+        return entry
+
+    def api_get_run(self, params, data, run_id):
+        return self.runs[int(run_id)]
+
+    def api_get_tests(self, params, data, run_id):
+        return self._page('tests', self.tests[int(run_id)], params,
+                          'get_tests/' + run_id)
+
+    def api_add_results_for_cases(self, params, data, run_id):
+        tests = {x['case_id']: x for x in self.tests[int(run_id)]}
+        results = []
+        for result in data['results']:
+            test = tests[result.pop('case_id')]
+            test['status_id'] = result['status_id']
+            results.append(dict(result, id=self._new_id(),
+                                test_id=test['id']))
+        self.results[int(run_id)].extend(results)
+        return results
@@ -0,0 +1,85 @@
+"""Synthetic xUnit reports and TestRail suites for benchmarks.
+
+xUnit case `i` has methodname ``test_case_<i>[(<100000 + i>)]`` and TestRail
+case `i` has `custom_report_label` ``<100000 + i>``, so they are matched by
+default name templates (``{id}`` and ``{custom_report_label}``).
+"""
+from __future__ import absolute_import
+
+import itertools
+import json
+from xml.sax.saxutils import escape
+from xml.sax.saxutils import quoteattr
+
+from xunit2testrail.testrail.client import Case
+from xunit2testrail.vendor.xunitparser import TestCase as XunitCase
+
+LABEL_BASE = 100000
+
+
+def make_cases_data(count, custom_fields=30):
+    """Return get_cases like response (decoded from JSON as for real)."""
+    cases = []
+    for i in range(count):
+        case = {'id': i + 1, 'title': 'test case {}'.format(i),
+                'section_id': 1, 'template_id': 1, 'type_id': 1,
+                'priority_id': 2, 'milestone_id': None, 'refs': None,
+                'created_by': 1, 'created_on': 1500000000, 'updated_by': 1,
+                'updated_on': 1500000000, 'estimate': None,
+                'estimate_forecast': None, 'suite_id': 1,
+                'display_order': i, 'is_deleted': 0,
+                'custom_report_label': str(LABEL_BASE + i)}
+        for j in range(custom_fields):
+            case['custom_field_{}'.format(j)] = j
+        cases.append(case)
+    # separate decoding of each case, as for paginated or cached responses
+    return [json.loads(json.dumps(x)) for x in cases]
+
+
+def make_testrail_cases(count, custom_fields=30):
+    return [Case(**x) for x in make_cases_data(count, custom_fields)]
+
+
+def make_xunit_cases(count):
+    return [XunitCase(classname='tests.test_module.TestClass',
+                      methodname='test_case_{0}[({1})]'.format(
+                          i, LABEL_BASE + i))
+            for i in range(count)]
+
+
+def _filler(size, line='Lorem ipsum dolor sit amet, consectetur adipiscing '
+                       'elit, sed do eiusmod tempor incididunt ut labore\n'):
+    return (line * (size // len(line) + 1))[:size]
+
+
+def write_xunit_report(path, count, failed=0.1, errors=0.02, skipped=0.05,
+                       stdout_size=0, trace_size=2000):
+    """Write xUnit report with `count` cases to `path`.
+
+    `failed`, `errors` and `skipped` are shares of cases with such outcome;
+    unsuccessful cases get trace of `trace_size` chars, all cases get
+    `stdout_size` chars of captured stdout.
+    """
+    # outcome of each case in a cycle of 100 cases
+    outcomes = ['failure'] * int(failed * 100)
+    outcomes += ['error'] * int(errors * 100)
+    outcomes += ['skipped'] * int(skipped * 100)
+    outcomes += [None] * (100 - len(outcomes))
+    trace = escape(_filler(trace_size))
+    stdout = escape(_filler(stdout_size))
+    with open(path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        f.write('<testsuite name="synthetic" tests="{}">\n'.format(count))
+        for i, outcome in zip(range(count), itertools.cycle(outcomes)):
+            f.write('<testcase classname="tests.test_module.TestClass" '
+                    'name={} time="0.5">'.format(quoteattr(
+                        'test_case_{0}[({1})]'.format(i, LABEL_BASE + i))))
+            if outcome == 'skipped':
+                f.write('<skipped message="skipped by benchmark"/>')
+            elif outcome is not None:
+                f.write('<{0} type="AssertionError" message="case {1} is '
+                        'failed">{2}</{0}>'.format(outcome, i, trace))
+            if stdout:
+                f.write('<system-out>{}</system-out>'.format(stdout))
+            f.write('</testcase>\n')
+        f.write('</testsuite>\n')
@@ -24,11 +24,12 @@ setup(
     url="https://github.com/gdyuldin/testrail_reporter",
     install_requires=[
         'setuptools>=17.1',
-        'requests>=2.4.2',
+        'requests>=2.10.0',
         'pytest-runner',
         'Jinja2',
         'six',
         'prettytable',
+        'futures; python_version < "3"',
     ],
     extras_require={'test': [
         'pytest-mock',
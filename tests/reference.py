@@ -0,0 +1,34 @@
+"""Reference (legacy) implementations, which tests and benchmarks compare
+optimized code with."""
+import re
+
+from xunit2testrail.utils import NoneValueException
+
+
+def legacy_suitable_cases(mapper, xunit_case, cases):
+    """Reference (not indexed) implementation of TemplateCaseMapper."""
+    xunit_dict = mapper.describe_xunit_case(xunit_case)
+    try:
+        xunit_id = mapper.xunit_name_template.format(**xunit_dict)
+    except NoneValueException:
+        return []
+    split_symbols = ''
+    for group in [r'a-zA-Z', r'\(\)', r'\[\]', r',', ]:
+        if re.search(r'[{}]'.format(group), xunit_id) is None:
+            split_symbols += group
+    split_expr = re.compile(r'[{}]'.format(split_symbols))\
+        if split_symbols else None
+    match_cases = []
+    for case in cases:
+        case_data = mapper.describe_testrail_case(case)
+        testrail_id = mapper.testrail_name_template.format(**case_data)
+        if split_expr is None:
+            if xunit_id == testrail_id:
+                match_cases.append(case)
+        else:
+            groups = [x for x in split_expr.split(testrail_id) if x]
+            groups.reverse()
+            for group in groups:
+                if group == xunit_id:
+                    match_cases.append(case)
+    return match_cases
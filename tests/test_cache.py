@@ -0,0 +1,58 @@
+import pytest
+
+from xunit2testrail.cache import MetadataCache
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return MetadataCache(str(tmpdir.join('cache')), ttl=60)
+
+
+def test_get_fetches_once(cache, mocker):
+    fetch = mocker.Mock(return_value=[{'id': 1}])
+    assert cache.get('key', fetch) == [{'id': 1}]
+    assert cache.get('key', fetch) == [{'id': 1}]
+    assert fetch.call_count == 1
+
+
+def test_cache_shared_between_instances(cache, mocker):
+    cache.save('key', {'a': 1})
+    other = MetadataCache(cache.cache_dir)
+    fetch = mocker.Mock()
+    assert other.get('key', fetch) == {'a': 1}
+    assert not fetch.called
+
+
+def test_expired_entry(cache, mocker):
+    cache.save('key', [1])
+    mocker.patch('time.time', return_value=10 ** 10)
+    assert cache.load('key') is None
+
+
+def test_refresh(cache, mocker):
+    cache.save('key', [1])
+    cache.refresh = True
+    fetch = mocker.Mock(return_value=[2])
+    assert cache.get('key', fetch) == [2]
+    cache.refresh = False
+    assert cache.load('key') == [2]
+
+
+def test_invalid_entry_is_refetched(cache, mocker):
+    cache.save('key', [1])
+    fetch = mocker.Mock(return_value=[2])
+    assert cache.get('key', fetch, is_valid=lambda data: False) == [2]
+
+
+def test_broken_file(cache):
+    cache.save('key', [1])
+    with open(cache._path('key'), 'w') as f:
+        f.write('{')
+    assert cache.load('key') is None
+
+
+def test_invalidate(cache, mocker):
+    cache.save('key', [1])
+    cache.invalidate('key')
+    cache.invalidate('absent')
+    assert cache.load('key') is None
@@ -1,3 +1,5 @@
+import json
+import subprocess
 import sys
 
 import pytest
@@ -54,3 +56,134 @@ def test_dry_run_not_create_entities_in_testrail(mocker, method):
     mocker.patch.object(sys, 'argv', testargs)
     cmd.main()
     assert not method_mock.called
+
+
+def test_parse_many_reports_args(tmpdir):
+    parsed_args = cmd.parse_args(
+        ['--iso-id', '1', 'tests/xunit_files/report.xml',
+         'tests/xunit_files', 'tests/xunit_files/*.xml'])
+    assert len(parsed_args.xunit_report) == 3
+
+
+def test_parse_not_existing_report(capsys):
+    with pytest.raises(SystemExit):
+        cmd.parse_args(['--iso-id', '1', 'tests/xunit_files/absent*.xml'])
+
+
+HEAVY_MODULES = ('jinja2', 'multiprocessing', 'prettytable', 'requests',
+                 'xunit2testrail.testrail.client')
+
+
+def run_python(code):
+    return subprocess.check_output([sys.executable, '-c', code]).decode()
+
+
+def test_cmd_import_not_loads_heavy_modules():
+    code = ('import sys\n'
+            'from xunit2testrail import cmd\n'
+            "cmd.parse_args(['--iso-id', '1', 'tests/xunit_files'])\n"
+            'print(" ".join(x for x in {!r} if x in sys.modules))'
+            ).format(HEAVY_MODULES)
+    assert run_python(code).split() == []
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7),
+                    reason='-X importtime requires Python 3.7+')
+def test_cmd_import_time_log():
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c',
+         'from xunit2testrail import cmd'],
+        stderr=subprocess.STDOUT).decode()
+    # lines are like "import time:   123 |   456 | package.module"
+    imported = set(line.rsplit('|', 1)[-1].strip()
+                   for line in output.splitlines()
+                   if line.startswith('import time:'))
+    assert 'xunit2testrail.cmd' in imported
+    assert imported.isdisjoint(HEAVY_MODULES)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7),
+                    reason='lazy package attributes require Python 3.7+')
+def test_package_import_is_lazy():
+    code = ('import sys\n'
+            'import xunit2testrail\n'
+            'print(" ".join(x for x in {!r} if x in sys.modules))\n'
+            'xunit2testrail.Reporter\n'
+            "print('requests' in sys.modules)").format(HEAVY_MODULES)
+    assert run_python(code).split() == ['True']
+
+
+def test_parse_status_map():
+    parsed_args = cmd.parse_args(
+        ['--iso-id', '1', 'tests/xunit_files/report.xml',
+         '--status-map', 'error=failed', '--status-map', 'skipped=6'])
+    assert dict(parsed_args.status_map) == {'error': 'failed', 'skipped': 6}
+
+
+def test_parse_status_map_unknown_outcome(capsys):
+    with pytest.raises(SystemExit):
+        cmd.parse_args(['--iso-id', '1', 'tests/xunit_files/report.xml',
+                        '--status-map', 'failed=blocked'])
+    assert "'failed' is not one of xUnit outcomes" in capsys.readouterr()[1]
+
+
+def test_parse_async_requires_python35(mocker, capsys):
+    mocker.patch.object(cmd.sys, 'version_info', (3, 4, 0))
+    with pytest.raises(SystemExit):
+        cmd.parse_args(['--iso-id', '1', 'tests/xunit_files/report.xml',
+                        '--testrail-async'])
+    assert '--testrail-async requires Python 3.5+' in capsys.readouterr()[1]
+
+
+def test_parse_journal_requires_run_update(capsys):
+    args = ['--iso-id', '1', 'tests/xunit_files/report.xml',
+            '--journal', 'journal.db']
+    with pytest.raises(SystemExit):
+        cmd.parse_args(args)
+    assert '--journal requires --testrail-run-update' in (
+        capsys.readouterr()[1])
+    parsed_args = cmd.parse_args(args + ['--testrail-run-update'])
+    assert parsed_args.journal == 'journal.db'
+
+
+def test_dry_run_stats(mocker, capsys, tmpdir):
+    mocker.patch('xunit2testrail.reporter.Reporter.map_cases')
+    stats_file = tmpdir.join('stats.json')
+    testargs = ['report', '--dry-run', 'tests/xunit_files/report.xml',
+                '--testrail-plan-name', 'testplan', '--stats',
+                '--stats-file', str(stats_file)]
+    mocker.patch.object(sys, 'argv', testargs)
+    cmd.main()
+    out, err = capsys.readouterr()
+    assert 'Phases:' in err
+    phases = json.loads(stats_file.read())['phases']
+    assert list(phases) == ['parse', 'map']
+
+
+def test_parse_suite_route():
+    parsed_args = cmd.parse_args(
+        ['--iso-id', '1', 'tests/xunit_files/report.xml',
+         '--suite-route', 'tempest.api.network=Network',
+         '--suite-route', 'tempest.scenario=Scenario'])
+    assert parsed_args.suite_route == [('tempest.api.network', 'Network'),
+                                       ('tempest.scenario', 'Scenario')]
+
+
+def test_report_returns_all_suites_runs(mocker):
+    parsed_args = cmd.parse_args(
+        ['--iso-id', '1', 'tests/xunit_files/report.xml',
+         '--suite-route', 'tempest.api.network=Network'])
+    mocker.patch.object(cmd, 'report_suites', return_value=['run1', 'run2'])
+    assert cmd.report(parsed_args, mocker.Mock()) == ['run1', 'run2']
+
+
+def test_report_suites_prefetch(mocker):
+    parsed_args = cmd.parse_args(
+        ['--iso-id', '1', 'tests/xunit_files/report.xml', '--dry-run',
+         '--suite-route', 'tempest.api.network=Network'])
+    parsed_args.testrail_async = True
+    reporter = mocker.MagicMock()
+    reporter.get_xunit_test_suite.return_value = ([], None)
+    assert cmd.report_suites(parsed_args, reporter) == []
+    reporter.prefetch_testrail.assert_called_once_with(plan=False,
+                                                       suite=False)
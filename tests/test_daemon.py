@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from xunit2testrail import daemon
+
+REPORT = os.path.abspath('tests/xunit_files/report.xml')
+
+
+def job_args(project='Project', plan='plan'):
+    return ['--testrail-url', 'http://testrail/', '--testrail-project',
+            project, '--testrail-plan-name', plan, REPORT]
+
+
+@pytest.fixture
+def server(tmpdir):
+    return daemon.ReportServer(str(tmpdir), workers=4, poll_interval=0.01)
+
+
+@pytest.fixture
+def report(mocker):
+    def report(args, reporter):
+        return [mocker.Mock(url='http://run/' + args.testrail_plan_name)]
+
+    return mocker.patch('xunit2testrail.daemon.report', side_effect=report)
+
+
+def read_results(path):
+    results = []
+    for name in sorted(os.listdir(path)):
+        with open(os.path.join(path, name)) as f:
+            results.append(json.load(f))
+    return results
+
+
+def test_ordered_executor_keeps_key_order():
+    executor = daemon.OrderedExecutor(workers=4)
+    calls = []
+
+    def task(key, value):
+        time.sleep(0.01 * (3 - value))
+        calls.append((key, value))
+
+    futures = [executor.submit(key, task, key, value)
+               for value in range(3) for key in 'ab']
+    for future in futures:
+        future.result()
+    executor.shutdown()
+    for key in 'ab':
+        assert [v for k, v in calls if k == key] == [0, 1, 2]
+
+
+def test_ordered_executor_runs_keys_concurrently():
+    executor = daemon.OrderedExecutor(workers=2)
+    started = threading.Event()
+    first = executor.submit('a', started.wait, 5)
+    executor.submit('b', started.set)
+    # first task is finished only if second one is run at the same time
+    assert first.result() is True
+    executor.shutdown()
+
+
+def test_serve_processes_jobs(server, report):
+    for plan in ('plan1', 'plan2'):
+        daemon.submit_job(server.spool_dir, job_args(plan=plan))
+    server.serve_forever(once=True)
+
+    results = read_results(server.done_dir)
+    assert [x['run_urls'] for x in results] == [['http://run/plan1'],
+                                                ['http://run/plan2']]
+    assert results[0]['args'] == job_args(plan='plan1')
+    assert not [x for x in os.listdir(server.spool_dir)
+                if x.endswith('.json') or x.endswith('.running')]
+
+
+def test_serve_wrong_job(server, report):
+    daemon.submit_job(server.spool_dir, ['--wrong-arg'])
+    server.serve_forever(once=True)
+    results = read_results(server.failed_dir)
+    assert len(results) == 1
+    assert 'Wrong job arguments' in results[0]['error']
+
+
+def test_serve_failed_job(server, report):
+    report.side_effect = Exception('TestRail is down')
+    daemon.submit_job(server.spool_dir, job_args())
+    server.serve_forever(once=True)
+    assert 'TestRail is down' in read_results(server.failed_dir)[0]['error']
+
+
+def test_serve_reuses_warm_state(server, report, mocker):
+    metadata = {'project': mocker.Mock()}
+    export = mocker.patch('xunit2testrail.reporter.Reporter.export_metadata',
+                          return_value=metadata)
+    import_ = mocker.patch(
+        'xunit2testrail.reporter.Reporter.import_metadata')
+    for plan in ('plan1', 'plan2'):
+        daemon.submit_job(server.spool_dir, job_args(plan=plan))
+    server.serve_forever(once=True)
+
+    assert export.call_count == 2
+    import_.assert_called_once_with(metadata)
+    reporters = [x[0][1] for x in report.call_args_list]
+    assert reporters[0].testrail_client is reporters[1].testrail_client
+    assert reporters[0].case_mapper is reporters[1].case_mapper
+
+
+def test_serve_parses_reports_in_threads(server, report):
+    daemon.submit_job(server.spool_dir, job_args())
+    server.serve_forever(once=True)
+    reporter = report.call_args[0][1]
+    assert reporter.parse_processes is False
+
+
+def test_serve_rejects_job_stats(server, report):
+    daemon.submit_job(server.spool_dir, job_args() + ['--stats'])
+    server.serve_forever(once=True)
+    assert not report.called
+    result, = read_results(server.failed_dir)
+    assert '--stats' in result['error']
+
+
+def test_recover_interrupted_job(server, report):
+    path = daemon.submit_job(server.spool_dir, job_args())
+    os.rename(path, path + daemon.RUNNING_SUFFIX)
+    server.serve_forever(once=True)
+    assert len(read_results(server.done_dir)) == 1
+
+
+def test_cmd_serve(tmpdir, report):
+    from xunit2testrail import cmd
+    daemon.submit_job(str(tmpdir), job_args())
+    cmd.main(['serve', '--spool-dir', str(tmpdir), '--once'])
+    assert len(read_results(str(tmpdir.join('done')))) == 1
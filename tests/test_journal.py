@@ -0,0 +1,39 @@
+from xunit2testrail.journal import ResultJournal
+
+URL = 'http://testrail/'
+
+
+def make_results(*comments):
+    return [{'case_id': i, 'status_id': 1, 'comment': comment}
+            for i, comment in enumerate(comments)]
+
+
+def test_unsent_results(tmpdir):
+    journal = ResultJournal(str(tmpdir.join('journal.db')))
+    results = make_results('a', 'b', 'c')
+    assert journal.unsent(URL, 1, results) == results
+    journal.record(URL, 1, results[:2])
+    assert journal.unsent(URL, 1, results) == results[2:]
+    # other run or TestRail
+    assert journal.unsent(URL, 2, results) == results
+    assert journal.unsent('http://other/', 1, results) == results
+
+
+def test_changed_result_is_unsent(tmpdir):
+    journal = ResultJournal(str(tmpdir.join('journal.db')))
+    journal.record(URL, 1, make_results('a', 'b'))
+    changed = make_results('a', 'new b')
+    assert journal.unsent(URL, 1, changed) == changed[1:]
+
+
+def test_journal_is_persistent(tmpdir):
+    path = str(tmpdir.join('journal.db'))
+    journal = ResultJournal(path)
+    journal.record(URL, 1, make_results('a'))
+    journal.save_paste(['paste', 'code'], 'http://paste/1/')
+    journal.close()
+
+    journal = ResultJournal(path)
+    assert journal.unsent(URL, 1, make_results('a')) == []
+    assert journal.get_paste(['paste', 'code']) == 'http://paste/1/'
+    assert journal.get_paste(['paste', 'other']) is None
@@ -1,13 +1,17 @@
 # -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
 import datetime
 import re
+import sys
 
 import pytest
 import six
 from six.moves import StringIO
 
 from xunit2testrail import Reporter
+from xunit2testrail.cache import MetadataCache
 from xunit2testrail.testrail.client import Case
+from xunit2testrail.testrail.exceptions import NotFound
 
 if six.PY2:
     import mock
@@ -123,6 +127,37 @@ def test_send_skipped_param(reporter, xunit_case_skipped, send_skipped):
     assert send_skipped == (testrail_case.result is not None)
 
 
+@pytest.mark.parametrize('result, status_map, status_id', [
+    ('success', None, 1),
+    ('failure', None, None),
+    ('failure', {'failure': 'custom_failed'}, 3),
+    ('error', {'error': 3}, 3),
+    ('success', {'success': 'absent'}, None),
+])
+def test_status_map(reporter, xunit_case, mocker, result, status_map,
+                    status_id):
+    mocker.patch('xunit2testrail.reporter.TrClient.statuses',
+                 new_callable=mock.PropertyMock,
+                 return_value={1: 'passed', 2: 'skipped', 3: 'custom_failed'})
+    reporter.status_map.update(status_map or {})
+    xunit_case.result = result
+    testrail_case = Case()
+    reporter.add_result_to_case(testrail_case, xunit_case)
+    result = testrail_case.result
+    assert (result and result.status_id) == status_id
+
+
+def test_status_index_not_used_per_case(reporter, xunit_case, mocker):
+    statuses = mocker.patch('xunit2testrail.reporter.Reporter.status_ids',
+                            new_callable=mock.PropertyMock,
+                            return_value={'passed': 1})
+    reporter.add_result_to_case(Case(), xunit_case)
+    calls_count = statuses.call_count
+    for _ in range(3):
+        reporter.add_result_to_case(Case(), xunit_case)
+    assert statuses.call_count == calls_count
+
+
 def test_no_trace_on_success_test_on_testrail(reporter, xunit_case):
     assert 'trace' not in reporter.gen_testrail_comment(xunit_case)
 
@@ -146,3 +181,382 @@ def test_paste_store_data(api_mock, reporter, xunit_case, paste_api, prop,
     assert value in payload['code']
     for absent_prop in absent_props:
         assert absent_prop not in payload['code']
+
+
+def test_testrail_client_is_reused(reporter):
+    assert reporter.testrail_client is reporter.testrail_client
+
+
+@pytest.fixture
+def paste_api_by_trace(api_mock):
+    """Paste service which returns trace as paste id."""
+    def callback(request, context):
+        trace = request.json()['code'].splitlines()[-1]
+        return {'data': trace}
+
+    paste_url = re.escape('http://example.com/json/?method=pastes.newPaste')
+    api_mock.register_uri('POST', re.compile(paste_url), json=callback,
+                          complete_qs=True)
+
+
+def test_fill_case_results_uploads_pastes(reporter, api_mock,
+                                          paste_api_by_trace):
+    from xunit2testrail.vendor.xunitparser import TestCase as XunitCase
+    reporter.paste_workers = 4
+    mapping = {}
+    for i in range(10):
+        xunit_case = XunitCase(classname='a.TestClass',
+                               methodname='test_{}'.format(i))
+        xunit_case.result = 'failure'
+        xunit_case.trace = 'trace{}'.format(i)
+        xunit_case.time = datetime.timedelta(seconds=1)
+        mapping[Case(id=i)] = xunit_case
+    reporter.testrail_statuses[3] = 'failed'
+    cases = reporter.fill_case_results(mapping)
+    assert len(cases) == 10
+    assert api_mock.call_count == 10
+    for case in cases:
+        paste_link = 'http://example.com/show/trace{}/'.format(case.id)
+        assert paste_link in case.result.comment
+
+
+def test_paste_request_timeout(reporter, xunit_case, paste_api, api_mock):
+    reporter.paste_timeout = 5
+    reporter.save_to_paste(xunit_case)
+    assert api_mock.request_history[-1].timeout == 5
+
+
+def test_paste_error_is_not_fatal(reporter, xunit_case, api_mock):
+    paste_url = re.escape('http://example.com/json/?method=pastes.newPaste')
+    api_mock.register_uri('POST', re.compile(paste_url), status_code=500,
+                          text='error')
+    xunit_case.result = 'failure'
+    reporter.upload_pastes([xunit_case])
+    assert reporter.get_paste_url(xunit_case) is None
+    assert api_mock.call_count == 1
+
+
+@pytest.fixture
+def testrail_api(api_mock):
+    base = 'https://testrail/index.php?/api/v2/'
+    api_mock.get(base + 'get_projects',
+                 json=[{'id': 1, 'name': 'Test Project'}])
+    api_mock.get(base + 'get_suites/1',
+                 json=[{'id': 2, 'name': 'Test Suite', 'project_id': 1}])
+    api_mock.get(base + 'get_cases/1&suite_id=2',
+                 json=[{'id': 3, 'title': 'case', 'updated_on': 100}])
+    return api_mock
+
+
+def test_cases_metadata_cache(reporter, testrail_api, tmpdir):
+    reporter.metadata_cache = MetadataCache(str(tmpdir))
+    assert [x.id for x in reporter.cases] == [3]
+    requests_count = testrail_api.call_count
+
+    reporter._cache.clear()
+    testrail_api.get(
+        'https://testrail/index.php?/api/v2/'
+        'get_cases/1&suite_id=2&updated_after=100&limit=1', json=[])
+    cases = reporter.cases
+    assert [x.id for x in cases] == [3]
+    assert type(cases[0]) is Case
+    assert cases[0].title == 'case'
+    # only updated cases check is requested
+    assert testrail_api.call_count == requests_count + 1
+    assert 'updated_after=100' in testrail_api.last_request.url
+
+
+def test_cases_metadata_cache_invalidated(reporter, testrail_api, tmpdir):
+    reporter.metadata_cache = MetadataCache(str(tmpdir))
+    reporter.cases
+    reporter._cache.clear()
+    testrail_api.get(
+        'https://testrail/index.php?/api/v2/'
+        'get_cases/1&suite_id=2&updated_after=100&limit=1',
+        json=[{'id': 3, 'title': 'new title', 'updated_on': 200}])
+    testrail_api.get('https://testrail/index.php?/api/v2/'
+                     'get_cases/1&suite_id=2',
+                     json=[{'id': 3, 'title': 'new title',
+                            'updated_on': 200}])
+    assert reporter.cases[0].title == 'new title'
+
+
+def test_metadata_cache_miss_is_refetched(reporter, testrail_api, tmpdir):
+    reporter.metadata_cache = MetadataCache(str(tmpdir))
+    reporter.suite
+    reporter._cache.clear()
+    reporter.tests_suite_name = 'New Suite'
+    testrail_api.get('https://testrail/index.php?/api/v2/get_suites/1',
+                     json=[{'id': 2, 'name': 'Test Suite', 'project_id': 1},
+                           {'id': 4, 'name': 'New Suite', 'project_id': 1}])
+    assert reporter.suite.id == 4
+    reporter._cache.clear()
+    reporter.tests_suite_name = 'Absent Suite'
+    requests_count = testrail_api.call_count
+    with pytest.raises(NotFound):
+        reporter.suite
+    # project is cached, suites are fetched once
+    assert testrail_api.call_count == requests_count + 1
+
+
+def test_comment_template_loaded_once(reporter, xunit_case, mocker):
+    get_template = mocker.spy(reporter.env, 'get_template')
+    xunit_case.trace = 'trace'
+    for _ in range(3):
+        reporter.gen_testrail_comment(xunit_case)
+    assert get_template.call_count == 1
+
+
+@pytest.mark.parametrize('message', [None, 'ok'])
+def test_passed_comment_same_as_rendered(reporter, message):
+    from xunit2testrail.vendor.xunitparser import CaseRecord
+    for methodname in ('test_a', 'test_b[1]'):
+        xunit_case = CaseRecord(classname='a.TestClass',
+                                methodname=methodname)
+        xunit_case.seed('success', message=message)
+        jenkins_url = reporter.get_jenkins_report_url(xunit_case)
+        expected = reporter._render_comment(xunit_case, jenkins_url, None)
+        assert reporter.gen_testrail_comment(xunit_case) == expected
+
+
+def test_trace_in_comment(reporter, xunit_case):
+    xunit_case.result = 'failure'
+    xunit_case.trace = 'line1\n  line2'
+    comment = reporter.gen_testrail_comment(xunit_case)
+    assert '\n    line1\n\n      line2\n' in comment
+
+
+def test_custom_comment_template(reporter, xunit_case, tmpdir):
+    template = tmpdir.join('comment.md')
+    template.write('{{ xunit_case.methodname }} on {{ env_description }}')
+    reporter.comment_template_path = str(template)
+    comment = reporter.gen_testrail_comment(xunit_case)
+    assert comment == 'test_method on vlan_ceph'
+
+
+@pytest.mark.skipif(sys.version_info < (3, 5), reason='requires Python 3.5+')
+def test_prefetch_testrail(reporter, testrail_api):
+    base = 'https://testrail/index.php?/api/v2/'
+    testrail_api.get(base + 'get_milestones/1',
+                     json=[{'id': 4, 'name': '0.1'}])
+    testrail_api.get(base + 'get_plans/1', json=[{'id': 5, 'name': 'x'}])
+    reporter.prefetch_testrail()
+    requests_count = testrail_api.call_count
+
+    assert [x.id for x in reporter.cases] == [3]
+    assert reporter.milestone.id == 4
+    assert reporter.testrail_statuses == {1: 'passed', 2: 'skipped'}
+    testrail_api.post(base + 'add_plan/1', json={'id': 6, 'name': 'Plan'})
+    assert reporter.get_or_create_plan().id == 6
+    # only new plan is created
+    assert testrail_api.call_count == requests_count + 1
+
+
+@pytest.mark.skipif(sys.version_info < (3, 5), reason='requires Python 3.5+')
+def test_prefetch_testrail_without_suite(reporter, testrail_api):
+    base = 'https://testrail/index.php?/api/v2/'
+    testrail_api.get(base + 'get_milestones/1',
+                     json=[{'id': 4, 'name': '0.1'}])
+    testrail_api.get(base + 'get_plans/1', json=[{'id': 5, 'name': 'x'}])
+    reporter.prefetch_testrail(suite=False)
+
+    assert reporter.milestone.id == 4
+    assert 'suite' not in reporter._cache
+    assert 'cases' not in reporter._cache
+
+
+def test_import_metadata(reporter, testrail_api):
+    cases = reporter.cases
+    cases[0].add_result(status_id=1)
+    metadata = reporter.export_metadata()
+    assert set(metadata) == {'project', 'suite', 'cases'}
+
+    other = Reporter(xunit_report='tests/xunit_files/report.xml',
+                     env_description='', test_results_link='',
+                     case_mapper=None, paste_url=None)
+    other.import_metadata(metadata)
+    requests_count = testrail_api.call_count
+    assert other.cases is cases
+    assert cases[0].result is None
+    assert testrail_api.call_count == requests_count
+
+
+def test_paste_reused_from_journal(reporter, xunit_case, paste_api, api_mock,
+                                   tmpdir):
+    reporter.journal_path = str(tmpdir.join('journal.db'))
+    xunit_case.trace = 'trace'
+    url = reporter.save_to_paste(xunit_case)
+    reporter._cache.pop('journal')
+    assert reporter.save_to_paste(xunit_case) == url
+    assert api_mock.call_count == 1
+
+
+def test_create_missing_cases(reporter, testrail_api):
+    from xunit2testrail import TemplateCaseMapper
+    from xunit2testrail.vendor.xunitparser import CaseRecord
+    base = 'https://testrail/index.php?/api/v2/'
+    testrail_api.get(base + 'get_cases/1&suite_id=2',
+                     json=[{'id': 3, 'title': 'case', 'updated_on': 100,
+                            'custom_report_label': '1001'}])
+    testrail_api.get(base + 'get_sections/1&suite_id=2', json=[])
+    testrail_api.post(base + 'add_section/1', json={'id': 7, 'name': 'New'})
+    testrail_api.post(base + 'add_case/7', [
+        {'json': {'id': 4, 'custom_report_label': '1002'}},
+        {'json': {'id': 5, 'custom_report_label': '1003'}}])
+    reporter.case_mapper = TemplateCaseMapper(
+        xunit_name_template='{id}',
+        testrail_name_template='{custom_report_label}')
+    reporter.cases_section_name = 'New'
+    xunit_suite = [CaseRecord('a.Test', 'test_{}[({})]'.format(i, 1001 + i))
+                   for i in range(3)]
+    mapping = reporter.map_cases(xunit_suite)
+    mapping = reporter.create_missing_cases(xunit_suite, mapping)
+
+    assert sorted(x.id for x in mapping) == [3, 4, 5]
+    assert sorted(x.id for x in reporter.cases) == [3, 4, 5]
+    added = [x.json() for x in testrail_api.request_history
+             if 'add_case' in x.url]
+    assert sorted(x['custom_report_label'] for x in added) == ['1002',
+                                                               '1003']
+    # created cases are matched again without suite fetching
+    requests_count = testrail_api.call_count
+    assert len(reporter.map_cases(xunit_suite)) == 3
+    assert testrail_api.call_count == requests_count
+
+
+def test_create_missing_cases_partially(reporter, testrail_api):
+    from xunit2testrail import TemplateCaseMapper
+    from xunit2testrail.testrail.exceptions import AddError
+    from xunit2testrail.vendor.xunitparser import CaseRecord
+    base = 'https://testrail/index.php?/api/v2/'
+    testrail_api.get(base + 'get_cases/1&suite_id=2',
+                     json=[{'id': 3, 'title': 'case', 'updated_on': 100,
+                            'custom_report_label': '999'}])
+    testrail_api.get(base + 'get_sections/1&suite_id=2',
+                     json=[{'id': 7, 'name': 'New'}])
+
+    def add_case(request, context):
+        label = request.json()['custom_report_label']
+        if label == '1001':
+            context.status_code = 400
+            return {'error': 'bad case'}
+        return dict(request.json(), id=int(label))
+
+    testrail_api.post(base + 'add_case/7', json=add_case)
+    reporter.case_mapper = TemplateCaseMapper(
+        xunit_name_template='{id}',
+        testrail_name_template='{custom_report_label}')
+    reporter.cases_section_name = 'New'
+    reporter.create_workers = 1
+    xunit_suite = [CaseRecord('a.Test', 'test_{}[({})]'.format(i, 1000 + i))
+                   for i in range(3)]
+    mapping = reporter.map_cases(xunit_suite)
+    with pytest.raises(AddError):
+        reporter.create_missing_cases(xunit_suite, mapping)
+    # created cases are kept, so they are not created again
+    assert sorted(x.id for x in reporter.cases) == [3, 1000, 1002]
+
+
+@pytest.fixture
+def suites_api(testrail_api):
+    base = 'https://testrail/index.php?/api/v2/'
+    testrail_api.get(base + 'get_suites/1',
+                     json=[{'id': 2, 'name': 'Test Suite', 'project_id': 1},
+                           {'id': 3, 'name': 'Other', 'project_id': 1}])
+    testrail_api.get(base + 'get_cases/1&suite_id=3',
+                     json=[{'id': 4, 'title': 'other case'}])
+    testrail_api.get(base + 'get_milestones/1',
+                     json=[{'id': 5, 'name': '0.1'}])
+    return testrail_api
+
+
+def test_suite_reporter_shares_project(reporter, suites_api):
+    other = reporter.for_suite('Other')
+    assert [x.id for x in other.cases] == [4]
+    assert [x.id for x in reporter.cases] == [3]
+    assert other.project is reporter.project
+    assert other.testrail_client is reporter.testrail_client
+    assert len([x for x in suites_api.request_history
+                if 'get_projects' in x.url]) == 1
+
+
+def test_suite_reporter_metadata(reporter, suites_api):
+    cases = reporter.for_suite('Other').cases
+    metadata = reporter.export_metadata()
+    assert metadata['suites']['Other']['cases'] is cases
+
+    other = Reporter(xunit_report='tests/xunit_files/report.xml',
+                     env_description='', test_results_link='',
+                     case_mapper=None, paste_url=None)
+    other.config_testrail(**reporter._testrail_options)
+    other.import_metadata(metadata)
+    requests_count = suites_api.call_count
+    assert other.for_suite('Other').cases is cases
+    assert suites_api.call_count == requests_count
+    assert other.export_metadata()['suites'] == metadata['suites']
+
+
+def test_suites_runs_created_with_plan(reporter, suites_api):
+    base = 'https://testrail/index.php?/api/v2/'
+    suites_api.get(base + 'get_plans/1', json=[])
+
+    def add_plan(request, context):
+        plan = dict(request.json(), id=6)
+        for i, entry in enumerate(plan['entries']):
+            entry['runs'][0].update(id=10 + i, suite_id=entry['suite_id'])
+        return plan
+
+    suites_api.post(base + 'add_plan/1', json=add_plan)
+    suites_cases = [(reporter, reporter.cases),
+                    (reporter.for_suite('Other'),
+                     reporter.for_suite('Other').cases)]
+    runs = reporter.get_or_create_suites_runs(suites_cases)
+
+    assert [(x.id, x.suite_id) for x in runs] == [(10, 2), (11, 3)]
+    plan_requests = [x for x in suites_api.request_history
+                     if x.method == 'POST']
+    assert len(plan_requests) == 1
+    entries = plan_requests[0].json()['entries']
+    assert [x['case_ids'] for x in entries] == [[3], [4]]
+    assert entries[1]['name'] == 'vlan_ceph <Other>'
+
+
+def test_add_suites_results(reporter, mocker):
+    add_results = mocker.patch.object(
+        Reporter, 'add_results', side_effect=lambda run, cases, workers: run)
+    other = reporter.for_suite('Other')
+    assert reporter.add_suites_results(
+        [(reporter, 'run1', []), (other, 'run2', [])]) == ['run1', 'run2']
+    assert add_results.call_count == 2
+
+
+def test_add_suites_results_workers_are_bounded(reporter, mocker):
+    executor = mocker.patch('xunit2testrail.reporter.ThreadPoolExecutor',
+                            wraps=ThreadPoolExecutor)
+    add_results = mocker.patch.object(
+        Reporter, 'add_results', side_effect=lambda run, cases, workers: run)
+    reporter.results_batch['workers'] = 4
+    runs_cases = [(reporter, 'run{}'.format(i), []) for i in range(10)]
+    assert len(reporter.add_suites_results(runs_cases)) == 10
+    executor.assert_called_once_with(max_workers=4)
+    assert {x[1]['workers'] for x in add_results.call_args_list} == {1}
+
+
+def test_suite_reporter_state(reporter, tmpdir):
+    from xunit2testrail import TemplateCaseMapper
+    from xunit2testrail.cache import MetadataCache
+    reporter.metadata_cache = MetadataCache(str(tmpdir))
+    reporter.case_mapper = TemplateCaseMapper(
+        xunit_name_template='{id}',
+        testrail_name_template='{custom_report_label}')
+    other = reporter.for_suite('Other')
+    assert other.tests_suite_name == 'Other'
+    assert other.plan_name == reporter.plan_name
+    assert other.stats is reporter.stats
+    assert other.testrail_client is reporter.testrail_client
+    assert other.paste_session is reporter.paste_session
+    assert other.metadata_cache is reporter.metadata_cache
+    assert other.case_mapper is not reporter.case_mapper
+    assert other._paste_urls is not reporter._paste_urls
+    assert other._passed_comment_parts is not reporter._passed_comment_parts
+    assert other.results_batch == reporter.results_batch
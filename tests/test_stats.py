@@ -0,0 +1,74 @@
+import json
+
+from xunit2testrail.stats import endpoint_name
+from xunit2testrail.stats import Stats
+
+
+def test_endpoint_name():
+    assert endpoint_name('get_projects') == 'get_projects'
+    assert endpoint_name('get_cases/1&suite_id=2') == 'get_cases'
+    assert endpoint_name('add_results_for_cases/5') == 'add_results_for_cases'
+
+
+def test_record_request():
+    stats = Stats()
+    stats.record_request('get_cases', 0.2, status=200, sent=0, received=100)
+    stats.record_request('get_cases', 3, status=503)
+    stats.record_request('get_cases', 0.01)
+    stats.record_retry('get_cases')
+    data = stats.to_dict()['endpoints']['get_cases']
+    assert data['count'] == 3
+    assert data['errors'] == 2
+    assert data['retries'] == 1
+    assert data['received'] == 100
+    assert data['max_time'] == 3
+    assert list(data['buckets'].values()) == [1, 0, 1, 0, 0, 0, 1, 0, 0, 0]
+
+
+def test_sleeps_and_phases():
+    stats = Stats()
+    stats.record_sleep('throttle', 0)
+    stats.record_sleep('backoff', 1.5)
+    stats.record_sleep('backoff', 0.5)
+    with stats.phase('parse'):
+        pass
+    with stats.phase('map'):
+        pass
+    data = stats.to_dict()
+    assert data['sleeps'] == {'backoff': 2}
+    assert list(data['phases']) == ['parse', 'map']
+
+
+def test_summary():
+    stats = Stats()
+    stats.record_request('get_cases', 0.5, status=200)
+    with stats.phase('upload'):
+        pass
+    summary = stats.summary()
+    assert 'upload' in summary
+    assert 'get_cases' in summary
+
+
+def test_prometheus():
+    stats = Stats()
+    stats.record_request('get_cases', 0.2, status=200)
+    stats.record_request('get_cases', 0.7, status=200)
+    lines = stats.to_prometheus().splitlines()
+    assert 'testrail_requests_count_total{endpoint="get_cases"} 2' in lines
+    assert ('testrail_request_duration_seconds_bucket'
+            '{endpoint="get_cases",le="0.25"} 1') in lines
+    assert ('testrail_request_duration_seconds_bucket'
+            '{endpoint="get_cases",le="+Inf"} 2') in lines
+    assert '# TYPE testrail_request_duration_seconds histogram' in lines
+
+
+def test_export(tmpdir):
+    stats = Stats()
+    stats.record_request('get_cases', 0.2, status=200)
+    stats.export(str(tmpdir.join('stats.json')))
+    stats.export(str(tmpdir.join('stats.prom')))
+    data = json.loads(tmpdir.join('stats.json').read())
+    assert data['endpoints']['get_cases']['count'] == 1
+    assert 'testrail_requests_count_total' in tmpdir.join('stats.prom').read()
+    assert sorted(x.basename for x in tmpdir.listdir()) == ['stats.json',
+                                                           'stats.prom']
@@ -1,5 +1,6 @@
 import pytest
 
+from reference import legacy_suitable_cases
 from xunit2testrail.testrail import client
 from xunit2testrail import utils
 
@@ -140,16 +141,18 @@ def check_mapping(result, expected_dict):
         ['12345', 'test_b'],
         {'12345': 'test_a[(12345)]'}
     ),
-    xfail((
+    pytest.param(
         ['test_a[(12345)]', 'test_b[(12345)]'],
         ['12345'],
-        {}
-    )),
-    xfail((
+        {},
+        marks=xfail
+    ),
+    pytest.param(
         ['test_a[(12345)]'],
         ['12345', '12345'],
-        {}
-    )),
+        {},
+        marks=xfail
+    ),
 ))  # yapf: disable
 def test_map_cases(template_mapper, xunit_names, testrail_names, expected):
     from xunit2testrail.vendor.xunitparser import TestCase as XunitCase
@@ -211,3 +214,155 @@ def test_no_testrail_case_logging(caplog, template_mapper):
                           ))
 def test_truncate_head(banner, text, max_length, expected):
     assert utils.truncate_head(banner, text, max_length) == expected
+
+
+@pytest.mark.parametrize('x_tpl', ('{id}', '{methodname}', '{uuid}',
+                                   '{classname}.{methodname}'))
+def test_indexed_match_same_as_legacy(template_mapper, x_tpl):
+    from xunit2testrail.vendor.xunitparser import TestCase as XunitCase
+    uuid = '2390f766-836d-40ef-9aeb-e810d78207fb'
+    methodnames = ['test_a[(12345)]', 'test_b[(54321)]', 'test_a',
+                   'test_c[id-{}]'.format(uuid), 'test_d[(12345)]', '1,2']
+    labels = ['12345', '12345,12345', 'a(12345)', 'test_a', 'test_b',
+              uuid, 'test_c[id-{}]'.format(uuid), '(54321)[1,2]',
+              'a.b.C.test_a', '']
+    xunit_cases = [XunitCase(classname='a.b.C', methodname=x)
+                   for x in methodnames]
+    testrail_cases = [client.Case(custom_report_label=x, title=x)
+                      for x in labels]
+    template_mapper.xunit_name_template = x_tpl
+    index = template_mapper.index_cases(testrail_cases)
+    for xunit_case in xunit_cases:
+        expected = legacy_suitable_cases(template_mapper, xunit_case,
+                                         testrail_cases)
+        assert template_mapper.get_suitable_cases(xunit_case,
+                                                  index) == expected
+
+
+def test_index_renders_testrail_ids_once(template_mapper, mocker):
+    from xunit2testrail.vendor.xunitparser import TestCase as XunitCase
+    testrail_cases = [client.Case(custom_report_label=str(x))
+                      for x in range(10000, 10010)]
+    xunit_cases = [XunitCase(classname='a.b.C',
+                             methodname='test[({})]'.format(x))
+                   for x in range(10000, 10010)]
+    describe = mocker.spy(template_mapper, 'describe_testrail_case')
+    mapping = template_mapper.map(xunit_cases, testrail_cases)
+    assert len(mapping) == 10
+    assert describe.call_count == len(testrail_cases)
+
+
+def test_index_is_reused_for_same_cases(template_mapper):
+    testrail_cases = [client.Case(custom_report_label='12345')]
+    index = template_mapper.index_cases(testrail_cases)
+    assert template_mapper.index_cases(testrail_cases) is index
+    assert template_mapper.index_cases(list(testrail_cases)) is not index
+
+
+def write_report(path, cases):
+    with open(str(path), 'w') as f:
+        f.write('<testsuite name="suite" time="1.5">')
+        for name, result in cases:
+            f.write('<testcase classname="a.B" name="{}">'.format(name))
+            if result != 'success':
+                f.write('<{} message="msg">trace</{}>'.format(result, result))
+            f.write('</testcase>')
+        f.write('</testsuite>')
+
+
+@pytest.fixture
+def reports_dir(tmpdir):
+    write_report(tmpdir.join('b.xml'), [('test_2', 'success'),
+                                        ('test_3', 'skipped')])
+    write_report(tmpdir.join('a.xml'), [('test_1', 'failure'),
+                                        ('test_2', 'failure')])
+    tmpdir.mkdir('sub')
+    write_report(tmpdir.join('sub', 'c.xml'), [('test_3', 'success')])
+    tmpdir.join('notes.txt').write('')
+    return tmpdir
+
+
+def test_expand_report_paths(reports_dir):
+    a, b = str(reports_dir.join('a.xml')), str(reports_dir.join('b.xml'))
+    c = str(reports_dir.join('sub', 'c.xml'))
+    assert utils.expand_report_paths(str(reports_dir)) == [a, b, c]
+    assert utils.expand_report_paths(
+        [str(reports_dir.join('*.xml')), a]) == [a, b]
+    assert utils.expand_report_paths([c, a]) == [c, a]
+
+
+@pytest.mark.parametrize('workers, processes', [(1, True), (2, True),
+                                                (2, False)])
+def test_parse_xunit_reports(reports_dir, workers, processes):
+    paths = utils.expand_report_paths(str(reports_dir))
+    ts, tr = utils.parse_xunit_reports(paths, workers=workers,
+                                       processes=processes)
+    cases = {x.methodname: x.result for x in ts}
+    assert cases == {'test_1': 'failure', 'test_2': 'failure',
+                     'test_3': 'success'}
+    assert [x.methodname for x in ts] == ['test_1', 'test_2', 'test_3']
+    assert len(tr.failures) == 2
+    assert tr.time.total_seconds() == 4.5
+
+
+def test_new_case_data(template_mapper):
+    from xunit2testrail.vendor.xunitparser import TestCase as XunitCase
+    xunit_case = XunitCase(classname='a.b.C', methodname='test_a[(12345)]')
+    assert template_mapper.new_case_data(xunit_case) == {
+        'title': 'test_a[(12345)]', 'custom_report_label': '12345'}
+    xunit_case = XunitCase(classname='a.b.C', methodname='test_a')
+    assert template_mapper.new_case_data(xunit_case) is None
+
+
+def test_new_case_data_default():
+    class Mapper(utils.CaseMapper):
+        def get_suitable_cases(self, xunit_case, cases):
+            return []
+
+    assert Mapper().new_case_data(None) is None
+
+
+@pytest.mark.parametrize('template', ['{a}{b}', 'id {a}', '{a!r}', 'a'])
+def test_new_case_data_wrong_template(template_mapper, template):
+    template_mapper.testrail_name_template = template
+    with pytest.raises(ValueError):
+        template_mapper.new_case_data(None)
+
+
+def test_suite_router():
+    from xunit2testrail.vendor.xunitparser import TestCase as XunitCase
+    router = utils.SuiteRouter([('a.b', 'AB'), ('a', 'A'), ('a.b.c', 'ABC')],
+                               default='Default')
+    xunit_cases = [XunitCase(classname=x, methodname='test')
+                   for x in ('a.b.c.D', 'a.b.D', 'a.D', 'x.D', 'a.b.E')]
+    suites = router.split(xunit_cases)
+    assert list(suites) == ['ABC', 'AB', 'A', 'Default']
+    assert [x.classname for x in suites['AB']] == ['a.b.D', 'a.b.E']
+
+
+def test_suite_router_template():
+    from xunit2testrail.vendor.xunitparser import TestCase as XunitCase
+    router = utils.SuiteRouter([('1', 'One')], default='Default',
+                               template='{id}')
+    assert router.route(XunitCase('a.B', 'test[(12345)]')) == 'One'
+    assert router.route(XunitCase('a.B', 'test[(22345)]')) == 'Default'
+    # no id in name
+    assert router.route(XunitCase('a.B', 'test')) == 'Default'
+
+
+def test_atomic_write(tmpdir):
+    path = tmpdir.join('file.json')
+    path.write('old')
+    utils.atomic_write(str(path), 'new')
+    assert path.read() == 'new'
+    assert tmpdir.listdir() == [path]
+
+
+def test_atomic_write_error_keeps_file(tmpdir, mocker):
+    path = tmpdir.join('file.json')
+    path.write('old')
+    mocker.patch('os.fdopen', side_effect=IOError('disk is full'))
+    with pytest.raises(IOError):
+        utils.atomic_write(str(path), 'new')
+    assert path.read() == 'old'
+    assert tmpdir.listdir() == [path]
@@ -0,0 +1,188 @@
+import collections
+import datetime
+
+import pytest
+
+from xunit2testrail.vendor import xunitparser
+
+REPORT = 'tests/xunit_files/report.xml'
+
+
+def case_fields(case):
+    return (case.classname, case.methodname, case.report_id, case.result,
+            case.typename, case.message, case.trace, case.time, case.stdout,
+            case.stderr)
+
+
+@pytest.fixture
+def big_report(tmpdir):
+    path = tmpdir.join('big_report.xml')
+    stdout = 'x' * 10000
+    with path.open('w') as f:
+        f.write('<testsuites time="1.5"><testsuite name="big">')
+        for i in range(2000):
+            f.write('<testcase classname="a.B" name="test_{0}" time="1">'
+                    '<failure message="fail">trace {0}</failure>'
+                    '<system-out>{1}</system-out>'
+                    '</testcase>'.format(i, stdout))
+        f.write('</testsuite></testsuites>')
+    return str(path)
+
+
+SMALL_REPORT = """<?xml version="1.0" encoding="utf-8"?>
+<testsuite name="small" tests="4" time="3.5">
+<properties><property name="env" value="ci"/></properties>
+<testcase classname="pkg.mod.TestA" name="test_ok[(101)]" time="0.5">
+<system-out>out 1</system-out></testcase>
+<testcase classname="pkg.mod.TestA" name="test_fail" time="1.25">
+<failure type="AssertionError" message="1 != 2">Traceback
+  assert 1 == 2</failure>
+<system-out>out 2</system-out><system-err>err 2</system-err></testcase>
+<testcase classname="pkg.mod.TestB" name="test_error" time="1">
+<error type="RuntimeError" message="boom">trace 3</error></testcase>
+<testcase classname="pkg.mod.TestB" name="test_skip" time="0">
+<skipped type="pytest.skip" message="not now">skip trace</skipped></testcase>
+</testsuite>
+"""
+
+# fields of SMALL_REPORT cases, as parsed by original minidom based parser
+# (text of passed case element is its trace, even if it is whitespace)
+SMALL_REPORT_CASES = [
+    ('pkg.mod.TestA', 'test_ok[(101)]', None, 'success', None, None, '\n',
+     datetime.timedelta(seconds=0.5), 'out 1', None),
+    ('pkg.mod.TestA', 'test_fail', None, 'failure', 'AssertionError',
+     '1 != 2', 'Traceback\n  assert 1 == 2',
+     datetime.timedelta(seconds=1.25), 'out 2', 'err 2'),
+    ('pkg.mod.TestB', 'test_error', None, 'error', 'RuntimeError', 'boom',
+     'trace 3', datetime.timedelta(seconds=1), None, None),
+    ('pkg.mod.TestB', 'test_skip', None, 'skipped', 'pytest.skip',
+     'not now', 'skip trace', datetime.timedelta(0), None, None),
+]
+
+
+@pytest.fixture
+def small_report(tmpdir):
+    path = tmpdir.join('small_report.xml')
+    path.write(SMALL_REPORT)
+    return str(path)
+
+
+def test_parse_expected_fields(small_report):
+    ts, tr = xunitparser.parse(small_report)
+    assert [case_fields(x) for x in ts] == SMALL_REPORT_CASES
+    assert ts.name == 'small'
+    assert ts.properties == {'env': 'ci'}
+    assert tr.time == datetime.timedelta(seconds=3.5)
+    assert (len(tr.failures), len(tr.errors), len(tr.skipped)) == (1, 1, 1)
+
+
+def test_iterparse_expected_fields(small_report):
+    records = list(xunitparser.iterparse(small_report))
+    assert [case_fields(x) for x in records] == SMALL_REPORT_CASES
+    assert all(type(x) is xunitparser.CaseRecord for x in records)
+
+
+def test_iterparse_report_outcomes():
+    outcomes = collections.Counter(
+        x.result for x in xunitparser.iterparse(REPORT))
+    assert outcomes == {'success': 27, 'skipped': 25, 'failure': 13}
+
+
+def test_iterparse_suite_data():
+    expected, tr = xunitparser.parse(REPORT)
+    ts = xunitparser.TestSuite()
+    list(xunitparser.iterparse(REPORT, ts))
+    assert ts.name == expected.name
+    assert ts.properties == expected.properties
+    assert ts.time == tr.time
+
+
+def test_iterparse_is_lazy(big_report):
+    cases = xunitparser.iterparse(big_report)
+    case = next(cases)
+    assert case.methodname == 'test_0'
+    assert case.failed
+    assert case.trace == 'trace 0'
+
+
+def test_iterparse_memory_is_bounded(big_report):
+    tracemalloc = pytest.importorskip('tracemalloc')
+    tracemalloc.start()
+    try:
+        for case in xunitparser.iterparse(big_report):
+            case.stdout = None
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # report is about 20 MB
+    assert peak < 2 * 1024 * 1024
+
+
+@pytest.fixture
+def output_report(tmpdir):
+    path = tmpdir.join('output_report.xml')
+    with path.open('w') as f:
+        f.write('<testsuite name="out">'
+                '<testcase classname="a.B" name="test_big">'
+                '<failure message="fail">trace</failure><system-out>')
+        for i in range(200000):
+            f.write('line {}\n'.format(i))
+        f.write('end  </system-out><system-err>\n err \n</system-err>'
+                '</testcase>'
+                '<testcase classname="a.B" name="test_small">'
+                '<system-out> small </system-out></testcase></testsuite>')
+    return str(path)
+
+
+def test_parse_output_tail(output_report):
+    ts, _ = xunitparser.parse(output_report, max_output=1000)
+    big, small = ts
+    # trailing spaces are stripped
+    assert len(big.stdout) == 998
+    assert big.stdout.endswith('line 199999\nend')
+    assert big.stderr == 'err'
+    assert big.trace == 'trace'
+    assert small.stdout == 'small'
+
+
+def test_parse_output_tail_same_fields():
+    ts, _ = xunitparser.parse(REPORT)
+    with open(REPORT, 'rb') as f:
+        records = list(xunitparser.iterparse(f, max_output=10 ** 6))
+    assert [case_fields(x) for x in records] == [case_fields(x) for x in ts]
+
+
+def test_output_tail_memory_is_bounded(output_report):
+    tracemalloc = pytest.importorskip('tracemalloc')
+    full, _ = xunitparser.parse(output_report)
+    tracemalloc.start()
+    try:
+        list(xunitparser.iterparse(output_report, max_output=1000))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # stdout is about 2.5 MB
+    assert len(list(full)[0].stdout) > 2000000
+    assert peak < 1024 * 1024
+
+
+def test_parse_summary():
+    ts, tr = xunitparser.parse(REPORT)
+    assert tr.testsRun == len(ts) == 65
+    assert len(tr.failures) == 13
+    assert len(tr.skipped) == 25
+    assert tr.errors == []
+    assert not tr.wasSuccessful()
+    assert all(case.failed for case, _ in tr.failures)
+    case, text = tr.failures[0]
+    assert text == case.alltext
+
+
+def test_case_record_is_slotted():
+    case = xunitparser.TestCase('a.B', 'test_a')
+    case.seed('failure', 'Error', 'message', 'trace')
+    assert not hasattr(case, '__dict__')
+    assert case.failed and case.bad
+    assert case.alltext == 'Error: message\n\ntrace'
+    assert case.stdout is None
+    assert case == xunitparser.TestCase('a.B', 'test_a')
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from xunit2testrail.testrail import Client
+from xunit2testrail.testrail.client import Project
+
+BASE_URL = 'http://testrail/index.php?/api/v2/'
+
+
+@pytest.fixture
+def client():
+    from xunit2testrail.testrail.aio import AsyncClient
+    client = AsyncClient('http://testrail', 'user', 'password', pool_size=4)
+    yield client
+    client.close()
+
+
+def run(coro):
+    import asyncio
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_collection_list(client, api_mock):
+    api_mock.get(BASE_URL + 'get_projects',
+                 json=[{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}])
+    projects = run(client.projects.list())
+    assert [type(x) for x in projects] == [Project, Project]
+    assert run(client.projects.find(name='b')).id == 2
+
+
+def test_nested_collection(client, api_mock):
+    api_mock.get(BASE_URL + 'get_project/1', json={'id': 1, 'name': 'a'})
+    api_mock.get(BASE_URL + 'get_suites/1',
+                 json=[{'id': 2, 'name': 'suite'}])
+    project = run(client.projects.get(1))
+    suite = run(client.collection(project.suites).find(name='suite'))
+    assert suite.id == 2
+
+
+def test_lookups_are_concurrent(client, mocker):
+    import asyncio
+    barrier = threading.Barrier(2, timeout=5)
+
+    def query(method, url, **kwargs):
+        # both requests should be made at once to pass barrier
+        barrier.wait()
+        return []
+
+    mocker.patch.object(client.client, '_query', side_effect=query)
+
+    async def lookup():
+        return await asyncio.gather(client.projects(), client.statuses())
+
+    assert run(lookup()) == [[], {}]
+
+
+def test_run_stages(client):
+    calls = []
+
+    results = client.run_stages([
+        [lambda: calls.append(1) or 1, lambda: calls.append(2) or 2],
+        [lambda: calls.append(3) or 3],
+    ])
+    assert results == [[1, 2], [3]]
+    assert calls[-1] == 3
+
+
+def test_from_client_not_closes_client(mocker):
+    from xunit2testrail.testrail.aio import AsyncClient
+    sync_client = Client('http://testrail', 'user', 'password')
+    close = mocker.patch.object(sync_client, 'close')
+    client = AsyncClient.from_client(sync_client)
+    client.close()
+    assert client.client is sync_client
+    assert not close.called
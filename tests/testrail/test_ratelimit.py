@@ -0,0 +1,179 @@
+import re
+
+import pytest
+import requests
+from requests.packages.urllib3.exceptions import MaxRetryError
+from requests.packages.urllib3.exceptions import NewConnectionError
+
+from xunit2testrail.testrail.client import Client
+from xunit2testrail.testrail.ratelimit import backoff_delay
+from xunit2testrail.testrail.ratelimit import RateLimiter
+
+
+@pytest.fixture
+def clock(mocker):
+    """Fake time: sleep moves clock forward."""
+    now = [1000.0]
+    mocker.patch('time.time', side_effect=lambda: now[0])
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    return mocker.patch('time.sleep', side_effect=sleep)
+
+
+def test_unlimited(clock):
+    limiter = RateLimiter()
+    for _ in range(100):
+        assert limiter.acquire() == 0
+    assert not clock.called
+
+
+def test_rate(clock):
+    limiter = RateLimiter(rate=2, burst=1)
+    delays = [limiter.acquire() for _ in range(5)]
+    assert delays == [0, 0.5, 0.5, 0.5, 0.5]
+
+
+def test_burst(clock):
+    limiter = RateLimiter(rate=1, burst=3)
+    delays = [limiter.acquire() for _ in range(5)]
+    assert delays == [0, 0, 0, 1, 1]
+
+
+def test_pause(clock):
+    limiter = RateLimiter(rate=1, burst=1)
+    limiter.acquire()
+    limiter.pause(30)
+    assert limiter.acquire() == 30
+    assert limiter.acquire() == 1
+
+
+@pytest.mark.parametrize('attempt', range(8))
+def test_backoff_delay(attempt):
+    delay = min(60, 2 ** attempt)
+    assert delay / 2.0 <= backoff_delay(attempt) <= delay
+
+
+@pytest.fixture
+def responses_api(api_mock):
+    def register(responses):
+        url = re.escape('http://testrail/index.php?/api/v2/get_projects')
+        api_mock.register_uri('GET', re.compile(url), responses)
+    return register
+
+
+@pytest.fixture
+def client():
+    return Client(base_url='http://testrail/', username='user',
+                  password='password')
+
+
+def test_retry_after(client, clock, responses_api):
+    responses_api([{'status_code': 429, 'headers': {'Retry-After': '7'}},
+                   {'status_code': 200, 'json': []}])
+    client.projects()
+    clock.assert_called_once_with(7)
+
+
+@pytest.mark.parametrize('status', [500, 502, 503, 504])
+def test_retry_server_errors(client, clock, responses_api, status):
+    responses_api([{'status_code': status}, {'status_code': status},
+                   {'status_code': 200, 'json': []}])
+    assert client.projects() == []
+    assert clock.call_count == 2
+
+
+def test_retry_connection_error(client, clock, responses_api):
+    responses_api([{'exc': requests.ConnectionError},
+                   {'status_code': 200, 'json': []}])
+    assert client.projects() == []
+    assert clock.call_count == 1
+
+
+@pytest.fixture
+def add_case_api(api_mock):
+    def register(responses):
+        url = re.escape('http://testrail/index.php?/api/v2/add_case/1')
+        api_mock.register_uri('POST', re.compile(url), responses)
+    return register
+
+
+def add_case(client):
+    return client._query('POST', 'add_case/1', json={'title': 'case'})
+
+
+@pytest.mark.parametrize('response', [
+    {'status_code': 500},
+    {'status_code': 502},
+    {'exc': requests.ConnectionError},
+    {'exc': requests.ReadTimeout},
+])
+def test_no_retry_of_applied_add(client, clock, add_case_api, api_mock,
+                                 response):
+    add_case_api([response, {'status_code': 200, 'json': {'id': 1}}])
+    with pytest.raises((requests.HTTPError, requests.ConnectionError,
+                        requests.Timeout)):
+        add_case(client)
+    assert api_mock.call_count == 1
+
+
+@pytest.mark.parametrize('response', [
+    {'status_code': 503},
+    {'status_code': 429},
+    {'exc': requests.ConnectTimeout},
+    {'exc': requests.ConnectionError(MaxRetryError(
+        None, '/', NewConnectionError(None, 'refused')))},
+])
+def test_retry_not_applied_add(client, clock, add_case_api, api_mock,
+                               response):
+    add_case_api([response, {'status_code': 200, 'json': {'id': 1}}])
+    assert add_case(client) == {'id': 1}
+    assert api_mock.call_count == 2
+
+
+def test_no_retry_on_client_error(client, clock, responses_api, api_mock):
+    responses_api([{'status_code': 400}, {'status_code': 200, 'json': []}])
+    with pytest.raises(requests.HTTPError):
+        client.projects()
+    assert api_mock.call_count == 1
+
+
+def test_give_up_after_max_tries(client, clock, responses_api, api_mock):
+    client.max_tries = 3
+    responses_api([{'exc': requests.ConnectionError}] * 3)
+    with pytest.raises(requests.ConnectionError):
+        client.projects()
+    assert api_mock.call_count == 3
+
+
+def test_client_rate_limit(clock, responses_api):
+    client = Client(base_url='http://testrail/', username='user',
+                    password='password', rate_limit=120, pool_size=1)
+    responses_api([{'status_code': 200, 'json': []}])
+    for _ in range(3):
+        client.projects()
+    assert [x[0][0] for x in clock.call_args_list] == [0.5, 0.5]
+
+
+def test_stats_retries_and_sleeps(client, clock, responses_api):
+    responses_api([{'status_code': 429, 'headers': {'Retry-After': '7'}},
+                   {'status_code': 503},
+                   {'status_code': 200, 'json': [{'id': 1}]}])
+    client.projects()
+    stats = client.stats.endpoints['get_projects']
+    assert stats['count'] == 3
+    assert stats['errors'] == 2
+    assert stats['throttled'] == 1
+    assert stats['retries'] == 2
+    assert stats['received'] == len(b'[{"id": 1}]')
+    assert client.stats.sleeps['throttle'] == 7
+    assert 'backoff' in client.stats.sleeps
+
+
+def test_stats_connection_error(client, clock, responses_api):
+    responses_api([{'exc': requests.ConnectionError},
+                   {'status_code': 200, 'json': []}])
+    client.projects()
+    stats = client.stats.endpoints['get_projects']
+    assert (stats['count'], stats['errors'], stats['retries']) == (2, 1, 1)
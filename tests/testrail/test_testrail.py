@@ -2,6 +2,10 @@ import pytest
 import json
 import re
 from functools import partial
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
 
 from xunit2testrail.testrail.client import Case
 from xunit2testrail.testrail.client import Client
@@ -13,6 +17,7 @@ from xunit2testrail.testrail.client import Result
 from xunit2testrail.testrail.client import Run
 from xunit2testrail.testrail.client import Test as TrTest
 from xunit2testrail.testrail.client import Suite
+from xunit2testrail.testrail.exceptions import AddError
 from xunit2testrail.testrail.exceptions import NotFound
 
 
@@ -473,6 +478,53 @@ def test_add_case(api_mock, client, suite):
     assert new_case.id == 8
 
 
+def test_add_many_cases(api_mock, client, suite):
+    base = re.escape(client.base_url)
+
+    def add_case(request, context):
+        return dict(request.json(), id=int(request.json()['title'][-1]))
+
+    api_mock.register_uri('POST', re.compile(base + r'add_case/157'),
+                          json=add_case)
+    cases = suite.cases.add_many(
+        [{'title': 'case {}'.format(i)} for i in range(5)], section_id=157,
+        workers=3)
+    assert [x.id for x in cases] == list(range(5))
+    assert all(type(x) is Case and x._client is client for x in cases)
+    assert len([x for x in api_mock.request_history
+                if x.method == 'POST']) == 5
+
+
+def test_add_many_cases_partially(api_mock, client, suite):
+    base = re.escape(client.base_url)
+
+    def add_case(request, context):
+        if request.json()['title'] == 'case 1':
+            context.status_code = 400
+            return {'error': 'bad case'}
+        return dict(request.json(), id=int(request.json()['title'][-1]))
+
+    api_mock.register_uri('POST', re.compile(base + r'add_case/157'),
+                          json=add_case)
+    with pytest.raises(AddError) as e:
+        suite.cases.add_many(
+            [{'title': 'case {}'.format(i)} for i in range(3)],
+            section_id=157, workers=3)
+    assert isinstance(e.value.error, requests.HTTPError)
+    assert [x and x.id for x in e.value.added] == [0, None, 2]
+
+
+def test_add_section(api_mock, client, suite):
+    base = re.escape(client.base_url)
+    api_mock.register_uri(
+        'POST', re.compile(base + r'add_section/{}$'.format(suite.project_id)),
+        json={'id': 9, 'name': 'New', 'suite_id': suite.id})
+    section = suite.sections.add(name='New', suite_id=suite.id)
+    assert section.id == 9
+    assert api_mock.last_request.json() == {'name': 'New',
+                                            'suite_id': suite.id}
+
+
 def test_add_results_for_cases(api_mock, client, suite, run):
     base = re.escape(client.base_url)
 
@@ -515,10 +567,10 @@ def test_add_results_for_cases(api_mock, client, suite, run):
     [200],
     [429, 200],
     [429, 429, 429, 429, 200],
-    pytest.mark.xfail([429, 429, 429, 429, 429, 200]),
-    pytest.mark.xfail([300]),
-    pytest.mark.xfail([400]),
-    pytest.mark.xfail([500]), ))
+    pytest.param([429, 429, 429, 429, 429, 200], marks=pytest.mark.xfail),
+    pytest.param([300], marks=pytest.mark.xfail),
+    pytest.param([400], marks=pytest.mark.xfail),
+    pytest.param([500], marks=pytest.mark.xfail), ))
 def test_http_errors(api_mock, mocker, statuses):
     client = Client(
         base_url='http://testrail/', username='user', password='password')
@@ -535,3 +587,377 @@ def test_http_errors(api_mock, mocker, statuses):
 
     mocker.patch('time.sleep')
     client.projects()
+
+
+def test_requests_use_client_session(api_mock, client, mocker):
+    session_request = mocker.spy(client.session, 'request')
+    project = client.projects()[0]
+    project.suites()
+    assert session_request.call_count == 2
+    request = api_mock.request_history[-1]
+    assert request.headers['Content-type'] == 'application/json'
+    assert 'gzip' in request.headers['Accept-Encoding']
+    assert request.headers['Authorization'].startswith('Basic ')
+
+
+def test_client_without_gzip(api_mock):
+    client = Client(base_url='http://testrail/', username='user',
+                    password='password', gzip=False, pool_size=2)
+    api_mock.register_uri('GET', re.compile(re.escape(client.base_url)),
+                          json=[])
+    client.projects()
+    request = api_mock.request_history[-1]
+    assert request.headers['Accept-Encoding'] == 'identity'
+    assert client.session.adapters['http://']._pool_maxsize == 2
+
+
+@pytest.fixture
+def paginated_cases(api_mock, client):
+    """Register paginated get_cases with 1000 cases in pages of 250."""
+    total, page_size = 1000, 250
+    url = 'get_cases/1&suite_id=2'
+
+    def callback(request, context):
+        context.status_code = 200
+        params = dict(re.findall(r'(offset|limit)=(\d+)', request.query))
+        offset = int(params.get('offset', 0))
+        limit = int(params.get('limit', page_size))
+        cases = [{'id': x, 'suite_id': 2, 'title': 'case {}'.format(x)}
+                 for x in range(offset, min(offset + limit, total))]
+        next_url = None
+        if offset + limit < total:
+            next_url = '/api/v2/{}&limit={}&offset={}'.format(
+                url, limit, offset + limit)
+        return json.dumps({'offset': offset, 'limit': limit,
+                           'size': len(cases),
+                           '_links': {'next': next_url, 'prev': None},
+                           'cases': cases})
+
+    api_mock.register_uri('GET',
+                          re.compile(re.escape(client.base_url + url)),
+                          text=callback)
+    return total
+
+
+def test_list_follows_pages(api_mock, suite, paginated_cases):
+    cases = suite.cases()
+    assert [x.id for x in cases] == list(range(paginated_cases))
+    assert api_mock.call_count == 2 + 4
+
+
+@pytest.mark.parametrize('workers', [2, 3, 8])
+def test_list_concurrent_pages(suite, paginated_cases, workers):
+    cases = suite.cases(workers=workers)
+    assert [x.id for x in cases] == list(range(paginated_cases))
+    assert type(cases[0]) is Case
+
+
+def test_iter_is_lazy(api_mock, suite, paginated_cases):
+    calls = api_mock.call_count
+    cases = suite.cases.iter()
+    first = [next(cases) for _ in range(250)]
+    assert api_mock.call_count == calls + 1
+    assert first[-1].id == 249
+    assert len(list(cases)) == paginated_cases - 250
+
+
+def test_list_not_paginated(project):
+    assert len(project.runs.list(workers=4)) == 2
+
+
+@pytest.fixture
+def results_api(api_mock, client):
+    """Register add_results_for_cases, which echoes results with ids."""
+    def callback(request, context):
+        context.status_code = 200
+        results = request.json()['results']
+        return json.dumps([dict(x, id=x['case_id']) for x in results])
+
+    api_mock.register_uri(
+        'POST',
+        re.compile(re.escape(client.base_url) + r'add_results_for_cases/.*'),
+        text=callback)
+
+
+def make_cases_with_results(count, comment='comment'):
+    cases = [Case(id=x) for x in range(count)]
+    for case in cases:
+        case.add_result(status_id=1, comment=comment)
+    return cases
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_add_for_cases_batch_size(api_mock, run, results_api, workers):
+    cases = make_cases_with_results(10)
+    results = run.results.add_for_cases(run.id, cases, batch_size=3,
+                                        workers=workers)
+    batches = [x.json()['results'] for x in api_mock.request_history
+               if 'add_results_for_cases' in x.url]
+    assert [len(x) for x in batches] == [3, 3, 3, 1]
+    assert [x.id for x in results] == list(range(10))
+
+
+def test_add_for_cases_no_cases(api_mock, run):
+    assert run.results.add_for_cases(run.id, []) == []
+    assert not [x for x in api_mock.request_history if x.method == 'POST']
+
+
+def test_add_for_cases_batch_bytes(api_mock, run, results_api):
+    cases = make_cases_with_results(10, comment='x' * 1000)
+    run.results.add_for_cases(run.id, cases, batch_bytes=3500)
+    batches = [x for x in api_mock.request_history
+               if 'add_results_for_cases' in x.url]
+    assert len(batches) == 4
+    assert all(len(x.body) <= 3500 for x in batches)
+
+
+def test_add_for_cases_retries_batch(api_mock, client, run, mocker):
+    mocker.patch('time.sleep')
+    responses = [{'status_code': 503, 'text': 'unavailable'},
+                 {'status_code': 200, 'json': [{'id': 1, 'status_id': 1}]}]
+    api_mock.register_uri(
+        'POST',
+        re.compile(re.escape(client.base_url) + r'add_results_for_cases/.*'),
+        responses)
+    results = run.results.add_for_cases(run.id, make_cases_with_results(1))
+    assert len(results) == 1
+
+
+def test_add_for_cases_batch_retried_by_client_only(api_mock, client, run,
+                                                   mocker):
+    mocker.patch('time.sleep')
+    api_mock.register_uri(
+        'POST',
+        re.compile(re.escape(client.base_url) + r'add_results_for_cases/.*'),
+        status_code=503, text='unavailable')
+    with pytest.raises(requests.HTTPError):
+        run.results.add_for_cases(run.id, make_cases_with_results(1))
+    assert len([x for x in api_mock.request_history
+                if x.method == 'POST']) == client.max_tries
+
+
+def test_client_request_timeout(api_mock, client):
+    client.timeout = 5
+    client.projects()
+    assert api_mock.last_request.timeout == 5
+
+
+def test_add_for_cases_no_retry_on_client_error(api_mock, client, run):
+    api_mock.register_uri(
+        'POST',
+        re.compile(re.escape(client.base_url) + r'add_results_for_cases/.*'),
+        status_code=400, text='bad request')
+    with pytest.raises(requests.HTTPError):
+        run.results.add_for_cases(run.id, make_cases_with_results(1))
+    assert 'add_results_for_cases' in api_mock.last_request.url
+    assert len([x for x in api_mock.request_history
+                if x.method == 'POST']) == 1
+
+
+def test_plan_runs_from_entries(api_mock, project):
+    plan = project.plans.find(name='new_test_plan')
+    requests_count = api_mock.call_count
+    runs = plan.runs
+    assert api_mock.call_count == requests_count
+    assert [type(x) for x in runs] == [Run]
+    assert runs[0].plan_id == plan.id
+
+
+def test_find_run_stops_early(mocker):
+    plan = Plan(id=8, name='plan', entries=[
+        {'id': 1, 'suite_id': 2, 'runs': [{'id': 11, 'name': 'a'}]},
+        {'id': 2, 'suite_id': 3, 'runs': [{'id': 12, 'name': 'b'},
+                                          {'id': 13, 'name': 'b'}]},
+    ])
+    run_init = mocker.spy(Run, '__init__')
+    run = plan.find_run(name='b', suite_id=3)
+    assert run.id == 12
+    assert run.plan_id == 8
+    assert run_init.call_count == 2
+    with pytest.raises(NotFound):
+        plan.find_run(name='b', suite_id=2)
+
+
+def test_item_fields():
+    case = Case(id=1, title='title', custom_label='label', data='d')
+    assert case.id == 1
+    assert case.title == 'title'
+    assert case.custom_label == 'label'
+    assert case.data == {'title': 'title', 'custom_label': 'label',
+                         'data': 'd'}
+    with pytest.raises(AttributeError):
+        case.section_id
+    with pytest.raises(AttributeError):
+        case.custom_absent
+    assert not hasattr(case, '__dict__') or not case.__dict__
+
+
+def test_item_set_fields():
+    case = Case(title='title', custom_label='label')
+    case.title = 'new title'
+    case.custom_label = 'new label'
+    case.custom_new = 'new'
+    assert case.title == 'new title'
+    assert case.custom_label == 'new label'
+    assert case.data == {'title': 'new title', 'custom_label': 'new label',
+                         'custom_new': 'new'}
+
+
+def test_item_custom_fields_schema_is_shared():
+    first = Case(title='a', custom_a=1, custom_b=2)
+    second = Case(title='b', custom_a=3, custom_b=4)
+    assert first._custom_index is second._custom_index
+    assert (first.custom_b, second.custom_b) == (2, 4)
+
+
+def test_clients_are_independent(api_mock):
+    first = Client(base_url='http://first/', username='a', password='a')
+    second = Client(base_url='http://second/', username='b', password='b')
+    for client, name in ((first, 'first'), (second, 'second')):
+        api_mock.get(client.base_url + 'get_projects',
+                     json=[{'id': 1, 'name': name}])
+        api_mock.get(client.base_url + 'get_suites/1',
+                     json=[{'id': 2, 'name': name}])
+    project = first.projects()[0]
+    assert second.projects()[0].name == 'second'
+    # items keep using client, which they are received by
+    assert project.suites()[0].name == 'first'
+    assert api_mock.last_request.url.startswith('http://first/')
+
+
+def test_unbound_item_request():
+    with pytest.raises(ValueError):
+        Project(id=1, name='a').suites()
+
+
+def test_clients_share_adapter():
+    adapter = HTTPAdapter()
+    first = Client(base_url='http://first/', username='a', password='a',
+                   adapter=adapter)
+    second = Client(base_url='http://second/', username='b', password='b',
+                    adapter=adapter)
+    assert first.session.adapters['http://'] is adapter
+    assert second.session.adapters['https://'] is adapter
+
+
+def test_add_for_cases_journal_resumes(api_mock, client, run, tmpdir):
+    from xunit2testrail.journal import ResultJournal
+    journal = ResultJournal(str(tmpdir.join('journal.db')))
+    responses = [{'status_code': 200, 'json': [{'id': 1, 'status_id': 1}]},
+                 {'status_code': 400, 'text': 'bad request'}]
+    api_mock.register_uri(
+        'POST',
+        re.compile(re.escape(client.base_url) + r'add_results_for_cases/.*'),
+        responses)
+    cases = make_cases_with_results(4)
+    with pytest.raises(requests.HTTPError):
+        run.results.add_for_cases(run.id, cases, batch_size=2,
+                                  journal=journal)
+
+    api_mock.reset_mock()
+    api_mock.register_uri(
+        'POST',
+        re.compile(re.escape(client.base_url) + r'add_results_for_cases/.*'),
+        json=[{'id': 2, 'status_id': 1}])
+    run.results.add_for_cases(run.id, cases, batch_size=2, journal=journal)
+    sent = [x.json()['results'] for x in api_mock.request_history]
+    # only second batch is sent again
+    assert [[r['case_id'] for r in x] for x in sent] == [[2, 3]]
+
+    api_mock.reset_mock()
+    assert run.results.add_for_cases(run.id, cases, journal=journal) == []
+    assert api_mock.call_count == 0
+
+
+def test_add_for_cases_journal_records_each_batch(api_mock, client, run,
+                                                  tmpdir, mocker):
+    from xunit2testrail.journal import ResultJournal
+    journal = ResultJournal(str(tmpdir.join('journal.db')))
+    recorded = threading.Event()
+    record = journal.record
+
+    def record_batch(*args):
+        record(*args)
+        recorded.set()
+
+    mocker.patch.object(journal, 'record', side_effect=record_batch)
+
+    def callback(request, context):
+        results = request.json()['results']
+        if results[0]['case_id'] == 2:
+            # second batch is acknowledged only after first one is recorded
+            assert recorded.wait(5)
+        return [dict(x, id=x['case_id']) for x in results]
+
+    api_mock.register_uri(
+        'POST',
+        re.compile(re.escape(client.base_url) + r'add_results_for_cases/.*'),
+        json=callback)
+    results = run.results.add_for_cases(run.id, make_cases_with_results(4),
+                                        batch_size=2, journal=journal)
+    assert [x.id for x in results] == [0, 1, 2, 3]
+    assert journal.record.call_count == 2
+
+
+@pytest.fixture
+def delta_api(api_mock, client, results_api):
+    base = client.base_url
+    api_mock.get(base + 'get_tests/4', json=[
+        {'id': 20, 'case_id': 0, 'status_id': 1},
+        {'id': 21, 'case_id': 1, 'status_id': 5},
+        {'id': 22, 'case_id': 2, 'status_id': 1},
+    ])
+    api_mock.get(base + 'get_results_for_run/4', json=[
+        {'id': 33, 'test_id': 22, 'status_id': 1, 'comment': 'new'},
+        {'id': 32, 'test_id': 20, 'status_id': 1, 'comment': 'comment'},
+        {'id': 31, 'test_id': 22, 'status_id': 1, 'comment': 'comment'},
+    ])
+    return api_mock
+
+
+def sent_case_ids(api_mock):
+    return [x['case_id'] for request in api_mock.request_history
+            if 'add_results_for_cases' in request.url
+            for x in request.json()['results']]
+
+
+@pytest.mark.parametrize('compare_comments, expected', [
+    (False, [1, 3]),
+    (True, [1, 2, 3]),
+])
+def test_add_results_delta(delta_api, run, compare_comments, expected):
+    run.include_all = True
+    results = run.add_results_for_cases(make_cases_with_results(4),
+                                        delta=True,
+                                        compare_comments=compare_comments)
+    assert sent_case_ids(delta_api) == expected
+    assert [x.id for x in results] == expected
+
+
+def test_add_results_delta_nothing_changed(delta_api, run):
+    run.include_all = True
+    cases = make_cases_with_results(4)
+    cases[1].result.status_id = 5
+    cases[3].result = None
+    assert run.add_results_for_cases(cases, delta=True) == []
+    assert sent_case_ids(delta_api) == []
+
+
+def test_item_data_is_read_only():
+    case = Case(title='title')
+    with pytest.raises(TypeError):
+        case.data['title'] = 'new title'
+    with pytest.raises(TypeError):
+        case.data.update(title='new title')
+    assert dict(case.data, title='new title')['title'] == 'new title'
+    assert json.loads(json.dumps(case.data)) == {'title': 'title'}
+
+
+def test_custom_schemas_are_bounded(mocker):
+    from xunit2testrail.testrail import client as client_module
+    mocker.patch.object(client_module, 'MAX_CUSTOM_SCHEMAS', 3)
+    mocker.patch.object(client_module, '_custom_schemas', {})
+    cases = [Case(**{'custom_{}'.format(x): x}) for x in range(10)]
+    assert len(client_module._custom_schemas) <= 3
+    assert [x.data for x in cases] == [{'custom_{}'.format(x): x}
+                                       for x in range(10)]
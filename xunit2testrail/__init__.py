@@ -1,7 +1,29 @@
-from xunit2testrail.reporter import Reporter
-from xunit2testrail.utils import TemplateCaseMapper
+import importlib
+import sys
 
 __VERSION__ = '0.7.3'
 
 
 __all__ = ['TemplateCaseMapper', 'Reporter', '__VERSION__']
+
+# public names are imported on first access, so `report` command doesn't
+# load requests and jinja2 until they are needed
+_lazy_names = {
+    'Reporter': 'xunit2testrail.reporter',
+    'TemplateCaseMapper': 'xunit2testrail.utils',
+}
+
+
+def __getattr__(name):
+    if name not in _lazy_names:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(_lazy_names[name]), name)
+    globals()[name] = value
+    return value
+
+
+if sys.version_info < (3, 7):
+    # module __getattr__ is not supported
+    from xunit2testrail.reporter import Reporter  # noqa
+    from xunit2testrail.utils import TemplateCaseMapper  # noqa
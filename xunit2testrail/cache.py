@@ -0,0 +1,74 @@
+from __future__ import absolute_import
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+from .utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataCache(object):
+    """On-disk cache of TestRail API responses.
+
+    Each entry is stored to separate JSON file in `cache_dir` together with
+    its saving time. Entries older than `ttl` seconds are expired. With
+    `refresh` flag all entries are fetched again (and overwritten).
+    """
+
+    def __init__(self, cache_dir, ttl=3600, refresh=False):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.refresh = refresh
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def _path(self, key):
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, name + '.json')
+
+    def load(self, key):
+        """Return cached data or None if it is absent or expired."""
+        if self.refresh:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if entry.get('key') != key:
+            return None
+        if time.time() - entry['saved_at'] > self.ttl:
+            logger.debug('Cache entry "{}" is expired'.format(key))
+            return None
+        return entry['data']
+
+    def save(self, key, data):
+        entry = {'key': key, 'saved_at': time.time(), 'data': data}
+        # concurrent reporters never read partial file
+        atomic_write(self._path(key), json.dumps(entry))
+
+    def invalidate(self, key):
+        """Remove cached data, so it is fetched again on next `get`."""
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def get(self, key, fetch, is_valid=None):
+        """Return cached data for key or fetch and save it.
+
+        :param fetch: callable, which returns JSON-serializable data
+        :param is_valid: optional callable to check that cached data is
+            still actual
+        """
+        data = self.load(key)
+        if data is not None and (is_valid is None or is_valid(data)):
+            logger.debug('Use cached "{}"'.format(key))
+            return data
+        data = fetch()
+        self.save(key, data)
+        return data
@@ -1,7 +1,10 @@
 #!/usr/bin/env python
 
+from __future__ import print_function
+
 import argparse
 import functools
+import glob
 import logging
 import os
 import sys
@@ -9,20 +12,25 @@ import textwrap
 import traceback
 import warnings
 
-import prettytable
-
-from xunit2testrail import TemplateCaseMapper
-from xunit2testrail import Reporter
-
 warnings.simplefilter('always', DeprecationWarning)
 logger = logging.getLogger(__name__)
 
+# xUnit case results, which can be mapped by --status-map
+XUNIT_OUTCOMES = ('success', 'failure', 'error', 'skipped')
+
 if sys.version_info[0] == 3:
     str_cls = str
 else:
     str_cls = eval('unicode')
 
 
+def report_path(string):
+    if os.path.exists(string) or glob.glob(string):
+        return string
+    msg = "%r is not exists" % string
+    raise argparse.ArgumentTypeError(msg)
+
+
 def filename(string):
     if not os.path.exists(string):
         msg = "%r is not exists" % string
@@ -33,6 +41,28 @@ def filename(string):
     return string
 
 
+def status_mapping(string):
+    outcome, sep, status = string.partition('=')
+    if not sep or not outcome or not status:
+        msg = "%r is not in OUTCOME=STATUS format" % string
+        raise argparse.ArgumentTypeError(msg)
+    if outcome not in XUNIT_OUTCOMES:
+        msg = "%r is not one of xUnit outcomes: %s" % (
+            outcome, ', '.join(XUNIT_OUTCOMES))
+        raise argparse.ArgumentTypeError(msg)
+    if status.isdigit():
+        status = int(status)
+    return outcome, status
+
+
+def suite_route(string):
+    prefix, sep, suite = string.partition('=')
+    if not sep or not prefix or not suite:
+        msg = "%r is not in PREFIX=SUITE format" % string
+        raise argparse.ArgumentTypeError(msg)
+    return prefix, suite
+
+
 def parse_args(args):
     defaults = {
         'TESTRAIL_URL': 'https://mirantis.testrail.com',
@@ -48,16 +78,25 @@ def parse_args(args):
         'TESTRAIL_PLAN_NAME': None,
         'ENV_DESCRIPTION': '',
         'TEST_RESULTS_LINK': '',
-        'PASTE_BASE_URL': None
+        'PASTE_BASE_URL': None,
+        'TESTRAIL_CACHE_DIR': None,
+        'REPORT_JOURNAL': None,
     }
     defaults = {k: os.environ.get(k, v) for k, v in defaults.items()}
 
     parser = argparse.ArgumentParser(description='xUnit to testrail reporter')
     parser.add_argument(
         'xunit_report',
-        type=filename,
+        type=report_path,
+        nargs='+',
         default=defaults['XUNIT_REPORT'],
-        help='xUnit report XML file')
+        help=('xUnit report XML file, directory with reports or glob '
+              'pattern (many reports are merged to one)'))
+    parser.add_argument(
+        '--parse-workers',
+        type=int,
+        default=None,
+        help='number of processes to parse many xUnit reports')
 
     parser.add_argument(
         '--xunit-name-template',
@@ -108,6 +147,39 @@ def parse_args(args):
         type=str_cls,
         default=defaults['TESTRAIL_PASSWORD'],
         help='testrail password')
+    parser.add_argument(
+        '--testrail-pool-size',
+        type=int,
+        default=10,
+        help='max number of keep-alive connections to testrail')
+    parser.add_argument(
+        '--testrail-no-gzip',
+        dest='testrail_gzip',
+        action='store_false',
+        default=True,
+        help=('don\'t accept compressed testrail responses (they are '
+              'accepted by default)'))
+    parser.add_argument(
+        '--testrail-rate-limit',
+        type=int,
+        default=None,
+        help='max number of testrail requests per minute')
+    parser.add_argument(
+        '--testrail-timeout',
+        type=float,
+        default=None,
+        help='timeout (in seconds) of single testrail request')
+    parser.add_argument(
+        '--testrail-list-workers',
+        type=int,
+        default=4,
+        help='number of list pages to fetch from testrail concurrently')
+    parser.add_argument(
+        '--testrail-async',
+        action='store_true',
+        default=False,
+        help='make independent testrail lookups concurrently with asyncio '
+             'client (Python 3.5+)')
     parser.add_argument(
         '--testrail-project',
         type=str_cls,
@@ -123,28 +195,137 @@ def parse_args(args):
         type=str_cls,
         default=defaults['TESTRAIL_TEST_SUITE'],
         help='testrail project suite name')
+    parser.add_argument(
+        '--suite-route',
+        type=suite_route,
+        action='append',
+        default=[],
+        metavar='PREFIX=SUITE',
+        help=('report xUnit cases, which route string starts with PREFIX, '
+              'to testrail suite SUITE (other cases - to --testrail-suite); '
+              'can be repeated, runs of all suites are created in one plan'))
+    parser.add_argument(
+        '--suite-route-template',
+        type=str_cls,
+        default='{classname}',
+        help='template for xUnit cases to make route string')
     parser.add_argument(
         '--send-skipped',
         action='store_true',
         default=False,
         help='send skipped cases to testrail')
+    parser.add_argument(
+        '--status-map',
+        type=status_mapping,
+        action='append',
+        default=[],
+        metavar='OUTCOME=STATUS',
+        help=('testrail status name or id for xUnit case outcome (success, '
+              'failure, skipped, error), e.g. error=failed; can be repeated'))
     parser.add_argument(
         '--send-duplicates',
         action='store_true',
         default=False,
         help='send duplicated cases to testrail')
+    parser.add_argument(
+        '--create-missing-cases',
+        dest='cases_section',
+        metavar='SECTION',
+        type=str_cls,
+        default=None,
+        help=('create testrail cases for not matched xUnit cases in SECTION '
+              '(created if not exists); requires single field testrail name '
+              'template, e.g. {custom_report_label}'))
+    parser.add_argument(
+        '--create-workers',
+        type=int,
+        default=4,
+        help='max number of testrail cases to create at once')
     parser.add_argument(
         '--paste-url',
         type=str_cls,
         default=defaults['PASTE_BASE_URL'],
         help=('pastebin service JSON API URL to send test case logs and trace,'
               ' example: http://localhost:5000/'))
+    parser.add_argument(
+        '--paste-workers',
+        type=int,
+        default=8,
+        help='max number of concurrent uploads to pastebin service')
+    parser.add_argument(
+        '--paste-timeout',
+        type=float,
+        default=30,
+        help='timeout (in seconds) of single pastebin service request')
+    parser.add_argument(
+        '--results-batch-size',
+        type=int,
+        default=250,
+        help='max number of results in single add_results_for_cases call')
+    parser.add_argument(
+        '--results-batch-bytes',
+        type=int,
+        default=4 * 1024 * 1024,
+        help='max size (in bytes) of single add_results_for_cases call')
+    parser.add_argument(
+        '--results-workers',
+        type=int,
+        default=2,
+        help='max number of results batches to send concurrently')
+    parser.add_argument(
+        '--comment-template',
+        type=filename,
+        default=None,
+        help='jinja2 template file for testrail result comment')
     parser.add_argument(
         '--testrail-run-update',
         dest='use_test_run_if_exists',
         action='store_true',
         default=False,
         help='don\'t create new test run if such already exists')
+    parser.add_argument(
+        '--delta',
+        action='store_true',
+        default=False,
+        help=('send only results, which status differs from current test '
+              'status in run (useful with --testrail-run-update)'))
+    parser.add_argument(
+        '--delta-comments',
+        action='store_true',
+        default=False,
+        help='with --delta send also results with changed comment')
+    parser.add_argument(
+        '--cache-dir',
+        type=str_cls,
+        default=defaults['TESTRAIL_CACHE_DIR'],
+        help='directory to cache testrail projects, suites, cases, etc.')
+    parser.add_argument(
+        '--cache-ttl',
+        type=int,
+        default=3600,
+        help='time (in seconds) to keep cached testrail data')
+    parser.add_argument(
+        '--refresh-cache',
+        action='store_true',
+        default=False,
+        help=('fetch cached testrail data again (cases deletion is not '
+              'detected otherwise until --cache-ttl is expired)'))
+    parser.add_argument(
+        '--journal',
+        default=defaults['REPORT_JOURNAL'],
+        help=('SQLite journal file of sent results; rerun with the same '
+              'journal sends only not yet sent or changed results to exists '
+              'test run, so it requires --testrail-run-update'))
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        default=False,
+        help='print testrail requests and report phases timing to stderr')
+    parser.add_argument(
+        '--stats-file',
+        default=None,
+        help=('save testrail requests and report phases stats to file: '
+              'JSON for *.json, Prometheus textfile otherwise'))
     parser.add_argument(
         '--dry-run', '-n',
         action='store_true',
@@ -157,11 +338,18 @@ def parse_args(args):
         default=False,
         help='Verbose mode')
 
-    return parser.parse_args(args)
+    parsed_args = parser.parse_args(args)
+    if parsed_args.journal and not parsed_args.use_test_run_if_exists:
+        parser.error('--journal requires --testrail-run-update')
+    if parsed_args.testrail_async and sys.version_info < (3, 5):
+        parser.error('--testrail-async requires Python 3.5+')
+    return parsed_args
 
 
 def print_mapping_table(mapping, wrap=60):
     """Print mapping result table."""
+    import prettytable
+
     pt = prettytable.PrettyTable(field_names=['ID', 'Tilte', 'Xunit case'])
     pt.align = 'l'
     wrapper = functools.partial(
@@ -174,11 +362,13 @@ def print_mapping_table(mapping, wrap=60):
     print(pt)
 
 
-def main(args=None):
-
-    args = args or sys.argv[1:]
+def make_reporter(args, case_mapper=None, client=None):
+    """Make configured Reporter from parsed command line arguments.
 
-    args = parse_args(args)
+    `case_mapper` and TestRail `client` can be passed to reuse them.
+    """
+    from xunit2testrail import Reporter
+    from xunit2testrail import TemplateCaseMapper
 
     if not args.testrail_plan_name:
         args.testrail_plan_name = ('{0.testrail_milestone} iso '
@@ -188,22 +378,21 @@ def main(args=None):
                "It is recommended to use --testrail-plan-name parameter.")
         warnings.warn(msg, DeprecationWarning)
 
-    logger_dict = dict(stream=sys.stderr)
-    if args.verbose:
-        logger_dict['level'] = logging.DEBUG
-
-    logging.basicConfig(**logger_dict)
-
-    case_mapper = TemplateCaseMapper(
-        xunit_name_template=args.xunit_name_template,
-        testrail_name_template=args.testrail_name_template)
+    if case_mapper is None:
+        case_mapper = TemplateCaseMapper(
+            xunit_name_template=args.xunit_name_template,
+            testrail_name_template=args.testrail_name_template)
 
     reporter = Reporter(
         xunit_report=args.xunit_report,
         env_description=args.env_description,
         test_results_link=args.test_results_link,
         case_mapper=case_mapper,
-        paste_url=args.paste_url)
+        paste_url=args.paste_url,
+        paste_workers=args.paste_workers,
+        paste_timeout=args.paste_timeout,
+        comment_template=args.comment_template,
+        parse_workers=args.parse_workers)
     suite = args.testrail_suite.format(args)
     reporter.config_testrail(
         base_url=args.testrail_url,
@@ -215,21 +404,152 @@ def main(args=None):
         tests_suite=suite,
         send_skipped=args.send_skipped,
         send_duplicates=args.send_duplicates,
-        use_test_run_if_exists=args.use_test_run_if_exists)
+        use_test_run_if_exists=args.use_test_run_if_exists,
+        pool_size=args.testrail_pool_size,
+        gzip=args.testrail_gzip,
+        rate_limit=args.testrail_rate_limit,
+        timeout=args.testrail_timeout,
+        list_workers=args.testrail_list_workers,
+        results_batch_size=args.results_batch_size,
+        results_batch_bytes=args.results_batch_bytes,
+        results_workers=args.results_workers,
+        cache_dir=args.cache_dir,
+        cache_ttl=args.cache_ttl,
+        refresh_cache=args.refresh_cache,
+        client=client,
+        status_map=dict(args.status_map),
+        journal=args.journal,
+        delta=args.delta,
+        delta_comments=args.delta_comments,
+        cases_section=args.cases_section,
+        create_workers=args.create_workers)
+    return reporter
+
+
+def report(args, reporter):
+    """Report xUnit results with reporter. Return test runs.
+
+    With suite routes results are reported by `report_suites`. Returned
+    list is empty if nothing is reported (e.g. in dry run mode).
+    """
+    if args.suite_route:
+        return report_suites(args, reporter)
+    phase = reporter.stats.phase
+    if args.testrail_async:
+        with phase('prefetch'):
+            reporter.prefetch_testrail(plan=not args.dry_run)
 
-    xunit_suite, _ = reporter.get_xunit_test_suite()
-    mapping = reporter.map_cases(xunit_suite)
+    with phase('parse'):
+        xunit_suite, _ = reporter.get_xunit_test_suite()
+    with phase('map'):
+        mapping = reporter.map_cases(xunit_suite)
     if not args.dry_run:
-        cases = reporter.fill_case_results(mapping)
+        if args.cases_section:
+            with phase('create'):
+                mapping = reporter.create_missing_cases(xunit_suite, mapping)
+        with phase('fill'):
+            cases = reporter.fill_case_results(mapping)
         if len(cases) == 0:
             logger.warning('No cases matched, programm will terminated')
-            return
-        plan = reporter.get_or_create_plan()
-        test_run = reporter.get_or_create_test_run(plan, cases)
-        test_run.add_results_for_cases(cases)
+            return []
+        with phase('plan'):
+            plan = reporter.get_or_create_plan()
+        with phase('run'):
+            test_run = reporter.get_or_create_test_run(plan, cases)
+        with phase('upload'):
+            reporter.add_results(test_run, cases)
         reporter.print_run_url(test_run)
+        return [test_run]
     else:
         print_mapping_table(mapping)
+        return []
+
+
+def report_suites(args, reporter):
+    """Report xUnit results to many suites by routes. Return test runs."""
+    from xunit2testrail.utils import SuiteRouter
+
+    phase = reporter.stats.phase
+    router = SuiteRouter(args.suite_route,
+                         default=args.testrail_suite.format(args),
+                         template=args.suite_route_template)
+    if args.testrail_async:
+        with phase('prefetch'):
+            reporter.prefetch_testrail(plan=not args.dry_run, suite=False)
+    with phase('parse'):
+        xunit_suite, _ = reporter.get_xunit_test_suite()
+    with phase('map'):
+        reporters = []
+        mappings = []
+        for suite_name, xunit_cases in router.split(xunit_suite).items():
+            suite_reporter = reporter.for_suite(suite_name)
+            reporters.append(suite_reporter)
+            mappings.append((xunit_cases,
+                             suite_reporter.map_cases(xunit_cases)))
+    if args.dry_run:
+        for _, mapping in mappings:
+            print_mapping_table(mapping)
+        return []
+    if args.cases_section:
+        with phase('create'):
+            mappings = [
+                (xunit_cases,
+                 suite_reporter.create_missing_cases(xunit_cases, mapping))
+                for suite_reporter, (xunit_cases, mapping)
+                in zip(reporters, mappings)]
+    with phase('fill'):
+        suites_cases = []
+        for suite_reporter, (_, mapping) in zip(reporters, mappings):
+            cases = suite_reporter.fill_case_results(mapping)
+            if cases:
+                suites_cases.append((suite_reporter, cases))
+    if not suites_cases:
+        logger.warning('No cases matched, programm will terminated')
+        return []
+    with phase('run'):
+        runs = reporter.get_or_create_suites_runs(suites_cases)
+    with phase('upload'):
+        reporter.add_suites_results(
+            [(suite_reporter, run, cases)
+             for (suite_reporter, cases), run in zip(suites_cases, runs)])
+    for run in runs:
+        reporter.print_run_url(run)
+    return runs
+
+
+def report_stats(args, stats):
+    """Print and save stats as requested by command line arguments."""
+    if args.stats:
+        print(stats.summary(), file=sys.stderr)
+    if args.stats_file:
+        stats.export(args.stats_file)
+
+
+def setup_logging(verbose):
+    logger_dict = dict(stream=sys.stderr)
+    if verbose:
+        logger_dict['level'] = logging.DEBUG
+
+    logging.basicConfig(**logger_dict)
+
+
+def main(args=None):
+
+    args = args or sys.argv[1:]
+
+    if args[:1] == ['serve']:
+        from xunit2testrail import daemon
+        return daemon.main(args[1:])
+
+    args = parse_args(args)
+
+    setup_logging(args.verbose)
+
+    reporter = make_reporter(args)
+    try:
+        report(args, reporter)
+    finally:
+        report_stats(args, reporter.stats)
 
 
 if __name__ == '__main__':
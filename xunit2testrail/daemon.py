@@ -0,0 +1,343 @@
+"""Long-running reporter, which processes jobs from spool directory.
+
+Job is a JSON file `<name>.json` in spool directory with `report` command
+arguments: ``{"args": ["--testrail-plan-name", "plan", "/path/report.xml"]}``.
+Jobs are taken in names order (`submit_job` makes names from submission
+time). Processed job is moved to `done` or `failed` subdirectory together
+with its result (test runs urls or error).
+
+TestRail clients (with their connection pool and rate limiter), fetched
+metadata (project, suite, cases, statuses, also of `--suite-route` suites)
+and case mappers indexes are kept between jobs. Jobs of different projects
+are processed concurrently, jobs of the same project - one by one, in
+submission order. Reports are parsed in threads, as forking of
+multithreaded server is not safe. Per-job `--stats` and `--stats-file`
+are not supported.
+"""
+from __future__ import absolute_import
+
+import argparse
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from requests.adapters import HTTPAdapter
+
+from .cmd import make_reporter
+from .cmd import parse_args
+from .cmd import report
+from .cmd import setup_logging
+from .testrail import Client
+from .testrail.exceptions import AddError
+from .utils import atomic_write
+from .utils import TemplateCaseMapper
+
+logger = logging.getLogger(__name__)
+
+JOB_SUFFIX = '.json'
+RUNNING_SUFFIX = '.running'
+
+
+def _write_json(path, data):
+    atomic_write(path, json.dumps(data))
+
+
+def submit_job(spool_dir, args):
+    """Put `report` command arguments to spool directory as new job."""
+    name = '{:.6f}-{}{}'.format(time.time(), uuid.uuid4().hex, JOB_SUFFIX)
+    path = os.path.join(spool_dir, name)
+    _write_json(path, {'args': list(args)})
+    return path
+
+
+class OrderedExecutor(object):
+    """Thread pool, which runs tasks with the same key one by one.
+
+    Tasks with different keys are run concurrently, tasks with the same key
+    are run in submission order.
+    """
+
+    def __init__(self, workers):
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._lock = threading.Lock()
+        self._queues = {}
+
+    def submit(self, key, fn, *args, **kwargs):
+        task = (Future(), functools.partial(fn, *args, **kwargs))
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is not None:
+                queue.append(task)
+                return task[0]
+            self._queues[key] = deque()
+        self._executor.submit(self._run, key, task)
+        return task[0]
+
+    def _run(self, key, task):
+        while task is not None:
+            future, fn = task
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn())
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._lock:
+                queue = self._queues[key]
+                if queue:
+                    task = queue.popleft()
+                else:
+                    del self._queues[key]
+                    task = None
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class ReportServer(object):
+    """Process report jobs from spool directory with warm TestRail state.
+
+    :param workers: max number of jobs to process at once
+    :param metadata_ttl: seconds to reuse fetched TestRail metadata
+    :param pool_size: max number of connections to each TestRail
+    """
+
+    def __init__(self, spool_dir, workers=4, poll_interval=1.0,
+                 metadata_ttl=300, pool_size=10):
+        self.spool_dir = spool_dir
+        self.done_dir = os.path.join(spool_dir, 'done')
+        self.failed_dir = os.path.join(spool_dir, 'failed')
+        for path in (self.done_dir, self.failed_dir):
+            if not os.path.isdir(path):
+                os.makedirs(path)
+        self.poll_interval = poll_interval
+        self.metadata_ttl = metadata_ttl
+        self.executor = OrderedExecutor(workers)
+        # connection pool, shared by all clients
+        self.adapter = HTTPAdapter(pool_connections=pool_size,
+                                   pool_maxsize=pool_size)
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._mappers = {}
+        self._metadata = {}
+
+    def get_client(self, args):
+        key = (args.testrail_url, args.testrail_user, args.testrail_password)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = Client(
+                    base_url=args.testrail_url,
+                    username=args.testrail_user,
+                    password=args.testrail_password,
+                    pool_size=args.testrail_pool_size,
+                    gzip=args.testrail_gzip,
+                    rate_limit=args.testrail_rate_limit,
+                    timeout=args.testrail_timeout,
+                    adapter=self.adapter)
+        return client
+
+    @staticmethod
+    def _metadata_key(args):
+        return (args.testrail_url, args.testrail_user, args.testrail_project,
+                args.testrail_suite.format(args), args.testrail_milestone)
+
+    def get_mapper(self, args):
+        # mapper keeps index of last cases, so it is not shared between
+        # different suites
+        key = (self._metadata_key(args), args.xunit_name_template,
+               args.testrail_name_template)
+        with self._lock:
+            mapper = self._mappers.get(key)
+            if mapper is None:
+                mapper = self._mappers[key] = TemplateCaseMapper(
+                    xunit_name_template=args.xunit_name_template,
+                    testrail_name_template=args.testrail_name_template)
+        return mapper
+
+    def get_metadata(self, args):
+        with self._lock:
+            saved_at, metadata = self._metadata.get(
+                self._metadata_key(args), (0, None))
+        if time.time() - saved_at <= self.metadata_ttl:
+            return metadata
+
+    def save_metadata(self, args, metadata):
+        with self._lock:
+            self._metadata[self._metadata_key(args)] = (time.time(),
+                                                        metadata)
+
+    def load_job(self, path):
+        with open(path) as f:
+            job = json.load(f)
+        try:
+            args = parse_args(job['args'])
+        except SystemExit:
+            raise ValueError('Wrong job arguments: {}'.format(job['args']))
+        if args.stats or args.stats_file:
+            # client, and so its requests stats, is shared between jobs
+            raise ValueError('--stats and --stats-file are not supported '
+                             'by report server')
+        return job, args
+
+    def run_job(self, args):
+        """Report results of job. Return test runs urls."""
+        reporter = make_reporter(args, case_mapper=self.get_mapper(args),
+                                 client=self.get_client(args))
+        # forking of multithreaded server is not safe
+        reporter.parse_processes = False
+        metadata = self.get_metadata(args)
+        if metadata:
+            reporter.import_metadata(metadata)
+        try:
+            test_runs = report(args, reporter)
+        except AddError:
+            # keep cases, created before error, so they aren't created again
+            self.save_metadata(args, reporter.export_metadata())
+            raise
+        self.save_metadata(args, reporter.export_metadata())
+        return [x.url for x in test_runs]
+
+    def finish_job(self, path, job, run_urls=(), error=None):
+        name = os.path.basename(path)[:-len(RUNNING_SUFFIX)]
+        result = dict(job or {}, run_urls=list(run_urls))
+        if error is None:
+            logger.info('Job {} is done: {}'.format(
+                name, ', '.join(run_urls)))
+            result_path = os.path.join(self.done_dir, name)
+        else:
+            logger.error('Job {} is failed: {!r}'.format(name, error))
+            result['error'] = repr(error)
+            result_path = os.path.join(self.failed_dir, name)
+        _write_json(result_path, result)
+        os.remove(path)
+
+    def _on_job_done(self, path, job, future):
+        error = future.exception()
+        if error is None:
+            self.finish_job(path, job, run_urls=future.result())
+        else:
+            self.finish_job(path, job, error=error)
+
+    def submit(self, path):
+        """Submit claimed job file. Return future or None for wrong job."""
+        try:
+            job, args = self.load_job(path)
+        except Exception as e:
+            self.finish_job(path, None, error=e)
+            return None
+        future = self.executor.submit(
+            (args.testrail_url, args.testrail_project), self.run_job, args)
+        future.add_done_callback(
+            functools.partial(self._on_job_done, path, job))
+        return future
+
+    def poll(self):
+        """Claim new jobs from spool directory and submit them.
+
+        Job is claimed by renaming, so each job is taken by single server.
+        Returns futures of submitted jobs.
+        """
+        futures = []
+        names = sorted(x for x in os.listdir(self.spool_dir)
+                       if x.endswith(JOB_SUFFIX))
+        for name in names:
+            path = os.path.join(self.spool_dir, name)
+            running_path = path + RUNNING_SUFFIX
+            try:
+                os.rename(path, running_path)
+            except OSError:
+                # claimed by other server
+                continue
+            future = self.submit(running_path)
+            if future is not None:
+                futures.append(future)
+        return futures
+
+    def recover(self):
+        """Return jobs, left running by stopped server, to spool."""
+        for name in os.listdir(self.spool_dir):
+            if name.endswith(JOB_SUFFIX + RUNNING_SUFFIX):
+                path = os.path.join(self.spool_dir, name)
+                logger.warning('Restart interrupted job {}'.format(name))
+                os.rename(path, path[:-len(RUNNING_SUFFIX)])
+
+    def serve_forever(self, once=False):
+        """Poll spool directory until interrupted.
+
+        With `once` all available jobs are processed and method returns.
+        """
+        self.recover()
+        try:
+            while True:
+                futures = self.poll()
+                if once:
+                    wait(futures)
+                    return
+                time.sleep(self.poll_interval)
+        finally:
+            self.executor.shutdown()
+
+
+def parse_serve_args(args):
+    parser = argparse.ArgumentParser(
+        prog='report serve',
+        description='Process xUnit reports from spool directory')
+    parser.add_argument(
+        '--spool-dir',
+        default=os.environ.get('REPORT_SPOOL_DIR'),
+        required='REPORT_SPOOL_DIR' not in os.environ,
+        help='directory with report jobs')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='number of jobs to process at once')
+    parser.add_argument(
+        '--poll-interval',
+        type=float,
+        default=1.0,
+        help='seconds between spool directory checks')
+    parser.add_argument(
+        '--metadata-ttl',
+        type=int,
+        default=300,
+        help='seconds to reuse fetched testrail metadata')
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        default=10,
+        help='max number of connections to each testrail')
+    parser.add_argument(
+        '--once',
+        action='store_true',
+        default=False,
+        help='process available jobs and exit')
+    parser.add_argument(
+        '--verbose',
+        '-v',
+        action='store_true',
+        default=False,
+        help='Verbose mode')
+    return parser.parse_args(args)
+
+
+def main(args):
+    args = parse_serve_args(args)
+    setup_logging(args.verbose)
+    server = ReportServer(args.spool_dir,
+                          workers=args.workers,
+                          poll_interval=args.poll_interval,
+                          metadata_ttl=args.metadata_ttl,
+                          pool_size=args.pool_size)
+    try:
+        server.serve_forever(once=args.once)
+    except KeyboardInterrupt:
+        pass
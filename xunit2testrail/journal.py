@@ -0,0 +1,76 @@
+from __future__ import absolute_import
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data):
+    """Return stable hash of JSON-serializable data."""
+    dump = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(dump.encode('utf-8')).hexdigest()
+
+
+class ResultJournal(object):
+    """SQLite journal of results, acknowledged by TestRail.
+
+    Each sent result is recorded with its content hash, keyed by TestRail
+    url, run id and case id, so rerun of interrupted or failed report sends
+    only missing or changed results. Uploaded pastes urls are recorded too,
+    to reuse them for the same content.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30,
+                                   check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'url TEXT, run_id INTEGER, case_id INTEGER, hash TEXT, '
+                'sent_at REAL, PRIMARY KEY (url, run_id, case_id))')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS pastes ('
+                'hash TEXT PRIMARY KEY, url TEXT)')
+
+    def close(self):
+        self._db.close()
+
+    def unsent(self, url, run_id, results):
+        """Return results, which are not sent yet or changed since."""
+        with self._lock:
+            sent = dict(self._db.execute(
+                'SELECT case_id, hash FROM results '
+                'WHERE url = ? AND run_id = ?', (url, run_id)))
+        unsent = [x for x in results
+                  if sent.get(x['case_id']) != content_hash(x)]
+        if len(unsent) < len(results):
+            logger.info('{} of {} results are already sent to run {}'.format(
+                len(results) - len(unsent), len(results), run_id))
+        return unsent
+
+    def record(self, url, run_id, results):
+        """Record results as acknowledged by TestRail."""
+        now = time.time()
+        rows = [(url, run_id, x['case_id'], content_hash(x), now)
+                for x in results]
+        with self._lock, self._db:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)', rows)
+
+    def get_paste(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT url FROM pastes WHERE hash = ?',
+                                   (content_hash(key), )).fetchone()
+        return row and row[0]
+
+    def save_paste(self, key, url):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO pastes VALUES (?, ?)',
+                             (content_hash(key), url))
@@ -1,21 +1,45 @@
 from __future__ import absolute_import, print_function
 
+from concurrent.futures import ThreadPoolExecutor
+import copy
 from functools import wraps
 import logging
 import re
 from six.moves.urllib import parse
 
-from jinja2 import Environment, PackageLoader
 import requests
+from requests.adapters import HTTPAdapter
 
+from .cache import MetadataCache
+from .journal import ResultJournal
+from .stats import Stats
 from .testrail import Client as TrClient
+from .testrail.client import Case
+from .testrail.client import ItemSet
+from .testrail.client import Plan
 from .testrail.client import Run
+from .testrail.exceptions import AddError
 from .testrail.exceptions import NotFound
 from .vendor import xunitparser
+from .utils import expand_report_paths
+from .utils import parse_xunit_reports
 from .utils import truncate_head
 
 logger = logging.getLogger(__name__)
 
+COMMENT_TEMPLATE = 'testrail_comment.md'
+
+# max size of paste; only this tail of cases stdout and stderr is parsed
+MAX_PASTE_SIZE = 65535
+
+# xUnit case result to TestRail status name (or id)
+DEFAULT_STATUS_MAP = {
+    'success': 'passed',
+    'failure': 'failed',
+    'skipped': 'skipped',
+    'error': 'blocked',
+}
+
 
 def memoize(f):
     @wraps(f)
@@ -31,24 +55,61 @@ def memoize(f):
 
 class Reporter(object):
     def __init__(self, xunit_report, env_description, test_results_link,
-                 case_mapper, paste_url, *args, **kwargs):
+                 case_mapper, paste_url, paste_workers=8, paste_timeout=30,
+                 comment_template=None, parse_workers=None, *args,
+                 **kwargs):
         self._config = {}
         self._cache = {}
+        self._paste_urls = {}
+        self._suite_reporters = {}
+        self._suites_metadata = {}
+        self.journal_path = None
+        self.cases_section_name = None
+        # TestRail requests and report phases stats
+        self.stats = Stats()
         self.xunit_report = xunit_report
+        self.parse_workers = parse_workers
+        # parse many reports in processes (threads are used if False)
+        self.parse_processes = True
         self.env_description = env_description
         self.test_results_link = test_results_link
         self.case_mapper = case_mapper
         self.paste_url = paste_url
-        self.env = Environment(loader=PackageLoader('xunit2testrail'))
+        self.paste_workers = paste_workers
+        self.paste_timeout = paste_timeout
+        self.comment_template_path = comment_template
+        self._passed_comment_parts = {}
 
         super(Reporter, self).__init__(*args, **kwargs)
 
     def config_testrail(self, base_url, username, password, milestone, project,
                         tests_suite, plan_name, send_skipped=False,
-                        use_test_run_if_exists=False, send_duplicates=False):
+                        use_test_run_if_exists=False, send_duplicates=False,
+                        pool_size=10, gzip=True, rate_limit=None,
+                        list_workers=4,
+                        results_batch_size=250,
+                        results_batch_bytes=4 * 1024 * 1024,
+                        results_workers=2, cache_dir=None, cache_ttl=3600,
+                        refresh_cache=False, adapter=None, client=None,
+                        status_map=None, journal=None, delta=False,
+                        delta_comments=False, cases_section=None,
+                        create_workers=4, timeout=None):
+        # options to configure reporters of other suites (see `for_suite`)
+        self._testrail_options = dict(locals())
+        del self._testrail_options['self']
         self._config['testrail'] = dict(base_url=base_url,
                                         username=username,
-                                        password=password, )
+                                        password=password,
+                                        pool_size=pool_size,
+                                        gzip=gzip,
+                                        rate_limit=rate_limit,
+                                        adapter=adapter,
+                                        stats=self.stats,
+                                        timeout=timeout, )
+        self._cache.pop('testrail_client', None)
+        if client is not None:
+            # reuse existing (e.g. warm) client
+            self._cache['testrail_client'] = client
         self.milestone_name = milestone
         self.project_name = project
         self.tests_suite_name = tests_suite
@@ -56,60 +117,295 @@ class Reporter(object):
         self.plan_description = '{plan_name} tests'.format(
             plan_name=self.plan_name)
         self.send_skipped = send_skipped
+        self.status_map = dict(DEFAULT_STATUS_MAP, **(status_map or {}))
+        self._cache.pop('outcome_status_ids', None)
         self.send_duplicates = send_duplicates
         self.use_test_run_if_exists = use_test_run_if_exists
+        self.list_workers = list_workers
+        self.results_batch = dict(batch_size=results_batch_size,
+                                  batch_bytes=results_batch_bytes,
+                                  workers=results_workers,
+                                  delta=delta,
+                                  compare_comments=delta_comments)
+        self.journal_path = journal
+        self._cache.pop('journal', None)
+        self.cases_section_name = cases_section
+        self.create_workers = create_workers
+        self._cache.pop('cases_section', None)
+        self.metadata_cache = None
+        if cache_dir is not None:
+            self.metadata_cache = MetadataCache(cache_dir, ttl=cache_ttl,
+                                                refresh=refresh_cache)
 
     @property
+    @memoize
     def testrail_client(self):
         return TrClient(**self._config['testrail'])
 
+    def _cache_key(self, *parts):
+        config = self._config['testrail']
+        parts = (config['base_url'], config['username']) + parts
+        return ' '.join(str(x) for x in parts)
+
+    def _cached_list(self, collection, key, is_valid=None):
+        """Return all collection items, using metadata cache if enabled."""
+        if self.metadata_cache is None:
+            return collection(workers=self.list_workers)
+
+        def fetch():
+            return [dict(x.data, id=x.id)
+                    for x in collection(workers=self.list_workers)]
+
+        data = self.metadata_cache.get(self._cache_key(*key), fetch,
+                                       is_valid=is_valid)
+        items = ItemSet(collection._to_object(x) for x in data)
+        items._item_class = collection._item_class
+        return items
+
+    def _cached_find(self, collection, key, **kwargs):
+        """Find collection item, using metadata cache if enabled.
+
+        If item is absent in cached list (e.g. it is created after list was
+        cached), list is fetched again once.
+        """
+        try:
+            return self._cached_list(collection, key).find(**kwargs)
+        except NotFound:
+            if self.metadata_cache is None:
+                raise
+        logger.debug('{} is not found in cache, fetch it again'.format(
+            self._cache_key(*key)))
+        self.metadata_cache.invalidate(self._cache_key(*key))
+        return self._cached_list(collection, key).find(**kwargs)
+
     @property
     @memoize
     def project(self):
-        return self.testrail_client.projects.find(name=self.project_name)
+        return self._cached_find(self.testrail_client.projects,
+                                 key=['projects'], name=self.project_name)
 
     @property
     @memoize
     def milestone(self):
-        return self.project.milestones.find(name=self.milestone_name)
+        return self._cached_find(self.project.milestones,
+                                 key=['milestones', self.project.id],
+                                 name=self.milestone_name)
 
     @property
     @memoize
     def os_config(self):
-        return self.project.configs.find(name='Operation System')
+        return self._cached_find(self.project.configs,
+                                 key=['configs', self.project.id],
+                                 name='Operation System')
 
     @property
     @memoize
     def suite(self):
-        return self.project.suites.find(name=self.tests_suite_name)
+        return self._cached_find(self.project.suites,
+                                 key=['suites', self.project.id],
+                                 name=self.tests_suite_name)
+
+    def _cases_not_updated(self, cases_data):
+        """Check that no suite case was updated after cases were cached.
+
+        Deleted cases can't be detected this way, they are dropped from
+        cache only when it is expired or refreshed.
+        """
+        updated_on = max([0] + [x.get('updated_on') or 0 for x in cases_data])
+        updated = self.suite.cases.updated_after(updated_on)
+        if updated:
+            logger.debug('Suite cases were updated, cache is invalidated')
+        return not updated
 
     @property
     @memoize
     def cases(self):
-        return self.suite.cases()
+        return self._cached_list(self.suite.cases,
+                                 key=['cases', self.suite.id],
+                                 is_valid=self._cases_not_updated)
 
     @property
     @memoize
     def testrail_statuses(self):
-        return self.testrail_client.statuses
+        if self.metadata_cache is None:
+            return self.testrail_client.statuses
 
-    def get_or_create_plan(self):
-        """Get exists or create new TestRail Plan"""
+        def fetch():
+            return list(self.testrail_client.statuses.items())
+
+        statuses = self.metadata_cache.get(self._cache_key('statuses'), fetch)
+        return {int(k): v for k, v in statuses}
+
+    @property
+    @memoize
+    def status_ids(self):
+        """TestRail status name to id index."""
+        index = {}
+        for status_id, name in sorted(self.testrail_statuses.items()):
+            index.setdefault(name, status_id)
+        return index
+
+    @property
+    @memoize
+    def outcome_status_ids(self):
+        """xUnit case result to TestRail status id (or None) map."""
+        ids = {}
+        for outcome, status in self.status_map.items():
+            if status in self.testrail_statuses:
+                ids[outcome] = status
+            else:
+                ids[outcome] = self.status_ids.get(status)
+        return ids
+
+    metadata_names = ('project', 'milestone', 'suite', 'cases',
+                      'testrail_statuses')
+
+    def export_metadata(self):
+        """Return fetched TestRail metadata to reuse by other reporter.
+
+        Metadata of suite reporters (see `for_suite`) is exported under
+        `suites` key.
+        """
+        metadata = {k: self._cache[k] for k in self.metadata_names
+                    if k in self._cache}
+        suites = dict(self._suites_metadata)
+        suites.update((name, reporter.export_metadata())
+                      for name, reporter in self._suite_reporters.items())
+        if suites:
+            metadata['suites'] = suites
+        return metadata
+
+    def import_metadata(self, metadata):
+        """Use metadata, exported by reporter with same TestRail settings.
+
+        Results, left in cases by previous reporter, are dropped.
+        """
+        metadata = dict(metadata)
+        self._suites_metadata = metadata.pop('suites', {})
+        for case in metadata.get('cases', ()):
+            case.result = None
+        self._cache.update(metadata)
+
+    @property
+    @memoize
+    def journal(self):
+        """Journal of sent results (if enabled)."""
+        if self.journal_path:
+            return ResultJournal(self.journal_path)
+        return False
+
+    @property
+    @memoize
+    def paste_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.paste_workers,
+                              pool_maxsize=self.paste_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def find_plan(self):
+        """Return exists TestRail Plan or None"""
         try:
-            plan = self.project.plans.find(name=self.plan_name)
+            return self.project.plans.find(name=self.plan_name)
         except NotFound:
-            plan = self.project.plans.add(name=self.plan_name,
-                                          description=self.plan_description,
-                                          milestone_id=self.milestone.id)
-            logger.debug('Created new plan "{}"'.format(self.plan_name))
+            return None
+
+    def prefetch_testrail(self, plan=True, suite=True):
+        """Make independent TestRail lookups concurrently.
+
+        Project and statuses, then suite (with milestone and plan, if
+        `plan` is True), then suite cases are requested with asyncio client
+        (Python 3.5+ only) and stored, so later lookups make no requests.
+        Suite and cases are skipped if `suite` is False (e.g. for suite
+        routes, where each route has own suite).
+        """
+        from .testrail.aio import AsyncClient
+
+        def lookup(name):
+            return lambda: getattr(self, name)
+
+        def lookup_plan():
+            self._cache['plan'] = self.find_plan()
+
+        lookups = []
+        if suite:
+            lookups.append(lookup('suite'))
+        if plan:
+            lookups += [lookup('milestone'), lookup_plan]
+        stages = [[lookup('project'), lookup('testrail_statuses')], lookups]
+        if suite:
+            stages.append([lookup('cases')])
+        client = AsyncClient.from_client(self.testrail_client)
+        try:
+            client.run_stages(stages)
+        finally:
+            client.close()
+
+    def _get_plan(self):
+        if 'plan' in self._cache:
+            return self._cache.pop('plan')
+        return self.find_plan()
+
+    def create_plan(self, runs=()):
+        """Create TestRail Plan with entries of (not added) `runs`."""
+        plan = self.project.plans.add(
+            name=self.plan_name,
+            description=self.plan_description,
+            milestone_id=self.milestone.id,
+            entries=[Plan.entry_data(x) for x in runs])
+        plan.bind_runs(runs)
+        logger.debug('Created new plan "{}"'.format(self.plan_name))
+        return plan
+
+    def get_or_create_plan(self):
+        """Get exists or create new TestRail Plan"""
+        plan = self._get_plan()
+        if plan is None:
+            plan = self.create_plan()
         else:
             logger.debug('Founded plan "{}"'.format(self.plan_name))
         return plan
 
+    def for_suite(self, tests_suite_name):
+        """Return reporter of other suite of the same project."""
+        reporter = SuiteReporter(self, tests_suite_name)
+        metadata = self._suites_metadata.get(tests_suite_name)
+        if metadata:
+            reporter.import_metadata(metadata)
+        self._suite_reporters[tests_suite_name] = reporter
+        return reporter
+
+    def get_or_create_suites_runs(self, suites_cases):
+        """Return test runs of (suite reporter, cases) pairs in one plan.
+
+        New plan is created together with all runs by single request,
+        missing runs of exists plan are added one by one.
+        """
+        plan = self._get_plan()
+        if plan is None:
+            runs = [reporter.make_test_run(reporter.run_name, cases)
+                    for reporter, cases in suites_cases]
+            self.create_plan(runs)
+            return runs
+        logger.debug('Founded plan "{}"'.format(self.plan_name))
+        return [reporter.get_or_create_test_run(plan, cases)
+                for reporter, cases in suites_cases]
+
     def get_xunit_test_suite(self):
-        with open(self.xunit_report) as f:
-            ts, tr = xunitparser.parse(f)
-            return ts, tr
+        """Parse xUnit report(s).
+
+        `xunit_report` may be a path or list of paths, directories and
+        glob patterns. Many reports are parsed concurrently and merged.
+        """
+        paths = expand_report_paths(self.xunit_report)
+        if len(paths) == 1:
+            with open(paths[0], 'rb') as f:
+                ts, tr = xunitparser.parse(f, max_output=MAX_PASTE_SIZE)
+                return ts, tr
+        return parse_xunit_reports(paths, workers=self.parse_workers,
+                                   max_output=MAX_PASTE_SIZE,
+                                   processes=self.parse_processes)
 
     def get_jenkins_report_url(self, xunit_case):
         module, _, classname = xunit_case.classname.rpartition('.')
@@ -123,8 +419,7 @@ class Reporter(object):
             methodname=methodname)
 
     def save_to_paste(self, xunit_case):
-        max_paste_size = 65535
-        chars_available = max_paste_size
+        chars_available = MAX_PASTE_SIZE
 
         code = ''
 
@@ -151,56 +446,141 @@ class Reporter(object):
         if stderr:
             code += '\n' + stderr
 
-        r = requests.post(
+        journal = self.journal
+        paste_key = [self.paste_url, code]
+        if journal:
+            # same content is already uploaded by previous report
+            paste_url = journal.get_paste(paste_key)
+            if paste_url:
+                return paste_url
+
+        r = self.paste_session.post(
             parse.urljoin(self.paste_url, '/json/?method=pastes.newPaste'),
             json={
                 'language': 'multi',
                 'code': code
-            })
+            },
+            timeout=self.paste_timeout)
         paste_id = r.json().get('data')
         if paste_id:
-            return parse.urljoin(self.paste_url, '/show/{}/'.format(paste_id))
+            paste_url = parse.urljoin(self.paste_url,
+                                      '/show/{}/'.format(paste_id))
+            if journal:
+                journal.save_paste(paste_key, paste_url)
+            return paste_url
+
+    def _save_to_paste_safe(self, xunit_case):
+        try:
+            return self.save_to_paste(xunit_case)
+        except Exception as e:
+            logger.warning(e)
+
+    def get_paste_url(self, xunit_case):
+        """Return paste url for xunit case, upload it if it is not yet."""
+        key = id(xunit_case)
+        if key not in self._paste_urls:
+            self._paste_urls[key] = self._save_to_paste_safe(xunit_case)
+        return self._paste_urls[key]
+
+    def upload_pastes(self, xunit_cases):
+        """Upload logs and traces of unsuccessful cases concurrently.
+
+        Not more than `paste_workers` requests are made at once. Results
+        are used later by `get_paste_url`.
+        """
+        if not self.paste_url:
+            return
+        xunit_cases = [x for x in xunit_cases
+                       if not x.success and id(x) not in self._paste_urls]
+        if not xunit_cases:
+            return
+        with ThreadPoolExecutor(max_workers=self.paste_workers) as executor:
+            urls = executor.map(self._save_to_paste_safe, xunit_cases)
+            for xunit_case, url in zip(xunit_cases, urls):
+                self._paste_urls[id(xunit_case)] = url
+
+    @property
+    @memoize
+    def env(self):
+        # jinja2 is imported only when comments are rendered
+        from jinja2 import Environment, PackageLoader
+        return Environment(loader=PackageLoader('xunit2testrail'))
+
+    @property
+    @memoize
+    def comment_template(self):
+        """Compiled comment template (built-in or from file)."""
+        if self.comment_template_path is None:
+            return self.env.get_template(COMMENT_TEMPLATE)
+        with open(self.comment_template_path) as f:
+            return self.env.from_string(f.read())
+
+    @staticmethod
+    def format_trace(trace):
+        """Indent trace lines to be shown as code block."""
+        if not trace:
+            return ''
+        return ''.join('\n    {}\n'.format(line)
+                       for line in trace.splitlines())
+
+    def _render_comment(self, xunit_case, jenkins_url, paste_url):
+        return self.comment_template.render(
+            xunit_case=xunit_case,
+            env_description=self.env_description,
+            jenkins_url=jenkins_url,
+            paste_url=paste_url,
+            trace=self.format_trace(getattr(xunit_case, 'trace', None)))
+
+    def _gen_passed_comment(self, xunit_case, jenkins_url):
+        """Render comment of passed case from cached parts.
+
+        Comments of passed cases without trace differ only by jenkins url
+        (and message, which is usually empty), so template is rendered
+        once and url is inserted between shared prefix and suffix.
+        """
+        key = xunit_case.message
+        parts = self._passed_comment_parts.get(key)
+        if parts is None:
+            placeholder = '\x00jenkins_url\x00'
+            comment = self._render_comment(xunit_case, placeholder, None)
+            parts = comment.split(placeholder)
+            if len(parts) != 2:
+                parts = False
+            self._passed_comment_parts[key] = parts
+        if parts is False:
+            return self._render_comment(xunit_case, jenkins_url, None)
+        return jenkins_url.join(parts)
 
     def gen_testrail_comment(self, xunit_case):
-        template = self.env.get_template('testrail_comment.md')
         jenkins_url = self.get_jenkins_report_url(xunit_case)
+        is_plain_passed = all([xunit_case.success,
+                               not getattr(xunit_case, 'trace', None),
+                               hasattr(xunit_case, 'message'),
+                               self.comment_template_path is None])
+        if is_plain_passed:
+            return self._gen_passed_comment(xunit_case, jenkins_url)
+
         paste_url = None
         if not xunit_case.success and self.paste_url:
-            try:
-                paste_url = self.save_to_paste(xunit_case)
-            except Exception as e:
-                logger.warning(e)
+            paste_url = self.get_paste_url(xunit_case)
 
-        return template.render(xunit_case=xunit_case,
-                               env_description=self.env_description,
-                               jenkins_url=jenkins_url,
-                               paste_url=paste_url)
+        return self._render_comment(xunit_case, jenkins_url, paste_url)
 
     def add_result_to_case(self, testrail_case, xunit_case):
-        if xunit_case.success:
-            status_name = 'passed'
-        elif xunit_case.failed:
-            status_name = 'failed'
-        elif xunit_case.skipped:
-            if self.send_skipped:
-                status_name = 'skipped'
-            else:
-                logger.debug('Case {0.classname}.{0.methodname} '
-                             'is skipped'.format(xunit_case))
-                return
-        elif xunit_case.errored:
-            status_name = 'blocked'
-        else:
+        outcome = xunit_case.result
+        if outcome == 'skipped' and not self.send_skipped:
+            logger.debug('Case {0.classname}.{0.methodname} '
+                         'is skipped'.format(xunit_case))
+            return
+        if outcome not in self.status_map:
             logger.warning('Unknown xunit case {} status {}'.format(
                 xunit_case.methodname, xunit_case.result))
             return
-        status_ids = [k for k, v in self.testrail_statuses.items()
-                      if v == status_name]
-        if len(status_ids) == 0:
+        status_id = self.outcome_status_ids[outcome]
+        if status_id is None:
             logger.warning("Can't find status {} for result {}".format(
-                status_name, xunit_case.methodname))
+                self.status_map[outcome], xunit_case.methodname))
             return
-        status_id = status_ids[0]
         comment = self.gen_testrail_comment(xunit_case)
         elasped = int(xunit_case.time.total_seconds())
         if elasped > 0:
@@ -211,44 +591,197 @@ class Reporter(object):
         return testrail_case
 
     def map_cases(self, xunit_suite):
-        cases = self.suite.cases()
-        return self.case_mapper.map(xunit_suite, cases, self.send_duplicates)
+        return self.case_mapper.map(xunit_suite, self.cases,
+                                    self.send_duplicates)
+
+    @property
+    @memoize
+    def cases_section(self):
+        """Suite section for created cases (it is created if not exists)."""
+        sections = self.suite.sections
+        try:
+            return sections().find(name=self.cases_section_name)
+        except NotFound:
+            logger.debug('Create section "{}"'.format(
+                self.cases_section_name))
+            return sections.add(name=self.cases_section_name,
+                                suite_id=self.suite.id)
+
+    def create_missing_cases(self, xunit_suite, mapping):
+        """Create TestRail cases for xUnit cases, not found in mapping.
+
+        Cases are created concurrently in `cases_section_name` section and
+        are added to suite cases, so suite is not fetched again. Returns
+        mapping with created cases. If some cases are not created, cases
+        which are created are added to suite cases and `AddError` is
+        raised.
+        """
+        mapped = set(id(x) for x in mapping.values())
+        xunit_cases = []
+        cases_data = []
+        seen = set()
+        for xunit_case in xunit_suite:
+            if id(xunit_case) in mapped:
+                continue
+            data = self.case_mapper.new_case_data(xunit_case)
+            key = data and tuple(sorted(data.items()))
+            if data is None or key in seen:
+                continue
+            seen.add(key)
+            xunit_cases.append(xunit_case)
+            cases_data.append(data)
+        if not cases_data:
+            return mapping
+        logger.info('Create {} missing cases in section "{}"'.format(
+            len(cases_data), self.cases_section_name))
+        try:
+            created = self.suite.cases.add_many(cases_data,
+                                                self.cases_section.id,
+                                                workers=self.create_workers)
+        except AddError as e:
+            self._add_cases(x for x in e.added if x is not None)
+            raise
+        self._add_cases(created)
+        mapping = dict(mapping)
+        mapping.update(zip(created, xunit_cases))
+        return mapping
+
+    def _add_cases(self, created):
+        cases = ItemSet(self.cases)
+        cases.extend(created)
+        cases._item_class = Case
+        # new list, so mapper indexes it again on next mapping
+        self._cache['cases'] = cases
 
     def fill_case_results(self, mapping):
+        self.upload_pastes(x for x in mapping.values()
+                           if self.send_skipped or not x.skipped)
         filtered_cases = []
         for testrail_case, xunit_case in mapping.items():
             if self.add_result_to_case(testrail_case, xunit_case):
                 filtered_cases.append(testrail_case)
         return filtered_cases
 
-    def create_test_run(self, name, plan, cases):
+    @property
+    def run_name(self):
+        # run name can't have whitespaces in the beginning or in the end
+        # because they are silently trimmed by server side (API or database)
+        return ("{0.env_description} "
+                "<{0.tests_suite_name}>").format(self).strip()
+
+    def make_test_run(self, name, cases):
+        """Return new (not added to plan yet) test run of cases."""
         description = ('Run **{name}** on #{plan_name}. \n'
                        '[Test results]({self.test_results_link})').format(
                            name=name,
                            plan_name=self.plan_name,
                            self=self)
-        run = Run(name=name,
-                  description=description,
-                  suite_id=self.suite.id,
-                  milestone_id=self.milestone.id,
-                  config_ids=[],
-                  case_ids=[x.id for x in cases], )
+        return Run(name=name,
+                   description=description,
+                   suite_id=self.suite.id,
+                   milestone_id=self.milestone.id,
+                   config_ids=[],
+                   case_ids=[x.id for x in cases], )
+
+    def create_test_run(self, name, plan, cases):
+        run = self.make_test_run(name, cases)
         plan.add_run(run)
         return run
 
-    def get_or_create_test_run(self, plan, cases):
-        # run name can't have whitespaces in the beginning or in the end
-        # because they are silently trimmed by server side (API or database)
-        run_name = ("{0.env_description} "
-                    "<{0.tests_suite_name}>").format(self).strip()
+    def find_test_run(self, plan):
+        """Return exists test run of plan (if enabled) or None."""
         if self.use_test_run_if_exists:
             try:
-                run = plan.runs.find(name=run_name, suite_id=self.suite.id)
-                logger.debug('Found test run "{}"'.format(run_name))
+                run = plan.find_run(name=self.run_name,
+                                    suite_id=self.suite.id)
+                logger.debug('Found test run "{}"'.format(self.run_name))
                 return run
             except NotFound:
-                logger.debug('Test run "{}" not found'.format(run_name))
-        return self.create_test_run(run_name, plan, cases)
+                logger.debug('Test run "{}" not found'.format(self.run_name))
+        return None
+
+    def get_or_create_test_run(self, plan, cases):
+        run = self.find_test_run(plan)
+        if run is None:
+            run = self.create_test_run(self.run_name, plan, cases)
+        return run
+
+    def add_results(self, test_run, cases, workers=None):
+        """Send cases results to test run in batches.
+
+        With journal enabled only not yet sent results are sent, in delta
+        mode - only results, which differ from current tests state.
+        `workers` overrides configured number of concurrent batches.
+        """
+        options = dict(self.results_batch)
+        if workers is not None:
+            options['workers'] = workers
+        return test_run.add_results_for_cases(
+            cases, journal=self.journal or None, **options)
+
+    def add_suites_results(self, runs_cases):
+        """Send results to many test runs concurrently.
+
+        `runs_cases` is a list of (suite reporter, test run, cases). Not
+        more than `results_workers` batches are sent at once in total.
+        """
+        max_workers = self.results_batch['workers']
+        workers = max(min(len(runs_cases), max_workers), 1)
+        batch_workers = max(max_workers // workers, 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(reporter.add_results, run, cases,
+                                       workers=batch_workers)
+                       for reporter, run, cases in runs_cases]
+        return [x.result() for x in futures]
 
     def print_run_url(self, test_run):
         print('[TestRun URL] {}'.format(test_run.url))
+
+
+class SuiteReporter(Reporter):
+    """Reporter of one suite of multi-suite report.
+
+    It is configured with settings of parent reporter. TestRail client,
+    stats, metadata cache, paste session, project level lookups (project,
+    milestone, statuses) and journal are shared with parent; case mapper is
+    copied, as it keeps index of last mapped cases.
+    """
+
+    def __init__(self, parent, tests_suite_name):
+        super(SuiteReporter, self).__init__(
+            xunit_report=parent.xunit_report,
+            env_description=parent.env_description,
+            test_results_link=parent.test_results_link,
+            case_mapper=copy.copy(parent.case_mapper),
+            paste_url=parent.paste_url,
+            paste_workers=parent.paste_workers,
+            paste_timeout=parent.paste_timeout,
+            comment_template=parent.comment_template_path,
+            parse_workers=parent.parse_workers)
+        self.parent = parent
+        self.parse_processes = parent.parse_processes
+        self.stats = parent.stats
+        self.config_testrail(**dict(parent._testrail_options,
+                                    tests_suite=tests_suite_name,
+                                    client=parent.testrail_client))
+        self.metadata_cache = parent.metadata_cache
+
+    @property
+    def project(self):
+        return self.parent.project
+
+    @property
+    def milestone(self):
+        return self.parent.milestone
+
+    @property
+    def testrail_statuses(self):
+        return self.parent.testrail_statuses
+
+    @property
+    def journal(self):
+        return self.parent.journal
+
+    @property
+    def paste_session(self):
+        return self.parent.paste_session
@@ -0,0 +1,172 @@
+from __future__ import absolute_import
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import json
+import threading
+import time
+
+from .utils import atomic_write
+
+# request duration histogram buckets (seconds)
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float('inf'))
+
+
+def endpoint_name(url):
+    """Return API endpoint name without ids and query, e.g. `get_cases`."""
+    return url.split('/', 1)[0].split('&', 1)[0]
+
+
+class Stats(object):
+    """Thread-safe collector of TestRail requests and report phases stats.
+
+    For each endpoint requests count, errors, latency histogram, bytes sent
+    and received and retries are recorded. Sleeps are recorded by reason
+    (`throttle` - rate limiter and 429 pauses, `backoff` - retry delays).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+        self.sleeps = {}
+        self.phases = OrderedDict()
+
+    def _endpoint(self, endpoint):
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = {
+                'count': 0, 'errors': 0, 'throttled': 0, 'retries': 0,
+                'time': 0.0, 'max_time': 0.0, 'sent': 0, 'received': 0,
+                'buckets': [0] * len(BUCKETS)}
+        return stats
+
+    def record_request(self, endpoint, elapsed, status=None, sent=0,
+                       received=0):
+        """Record request; `status` is None for connection errors."""
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats['count'] += 1
+            if status is None or status >= 400:
+                stats['errors'] += 1
+            if status == 429:
+                stats['throttled'] += 1
+            stats['time'] += elapsed
+            stats['max_time'] = max(stats['max_time'], elapsed)
+            stats['sent'] += sent
+            stats['received'] += received
+            for i, bound in enumerate(BUCKETS):
+                if elapsed <= bound:
+                    stats['buckets'][i] += 1
+                    break
+
+    def record_retry(self, endpoint):
+        with self._lock:
+            self._endpoint(endpoint)['retries'] += 1
+
+    def record_sleep(self, reason, seconds):
+        if seconds <= 0:
+            return
+        with self._lock:
+            self.sleeps[reason] = self.sleeps.get(reason, 0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        """Record wall time of code block (summed for repeated phases)."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0) + elapsed
+
+    def to_dict(self):
+        with self._lock:
+            endpoints = {}
+            for name, stats in self.endpoints.items():
+                stats = dict(stats)
+                stats['buckets'] = OrderedDict(
+                    (str(bound), count)
+                    for bound, count in zip(BUCKETS, stats['buckets']))
+                endpoints[name] = stats
+            return {'endpoints': endpoints,
+                    'sleeps': dict(self.sleeps),
+                    'phases': OrderedDict(self.phases)}
+
+    def summary(self):
+        """Return human readable stats text."""
+        data = self.to_dict()
+        lines = ['Phases:']
+        for name, seconds in data['phases'].items():
+            lines.append('  {:<10} {:9.3f}s'.format(name, seconds))
+        lines.append('TestRail requests:')
+        lines.append('  {:<28} {:>6} {:>6} {:>7} {:>9} {:>9} {:>10} '
+                     '{:>10}'.format('endpoint', 'count', 'errors',
+                                     'retries', 'avg', 'max', 'sent',
+                                     'received'))
+        for name, stats in sorted(data['endpoints'].items()):
+            lines.append(
+                '  {:<28} {count:>6} {errors:>6} {retries:>7} {avg:>8.3f}s '
+                '{max_time:>8.3f}s {sent:>10} {received:>10}'.format(
+                    name, avg=stats['time'] / max(stats['count'], 1),
+                    **stats))
+        for reason, seconds in sorted(data['sleeps'].items()):
+            lines.append('Sleep ({}): {:.3f}s'.format(reason, seconds))
+        return '\n'.join(lines)
+
+    def to_prometheus(self):
+        """Return stats in Prometheus text format."""
+        data = self.to_dict()
+        lines = []
+
+        def header(name, kind, help):
+            lines.append('# HELP {} {}'.format(name, help))
+            lines.append('# TYPE {} {}'.format(name, kind))
+
+        def sample(name, labels, value):
+            labels = ','.join('{}="{}"'.format(k, v) for k, v in labels)
+            lines.append('{}{{{}}} {}'.format(name, labels, value))
+
+        endpoints = sorted(data['endpoints'].items())
+        for key, help in (('count', 'TestRail requests'),
+                          ('errors', 'TestRail failed requests'),
+                          ('retries', 'TestRail retried requests'),
+                          ('sent', 'TestRail requests body bytes'),
+                          ('received', 'TestRail responses body bytes')):
+            name = 'testrail_requests_{}_total'.format(key)
+            header(name, 'counter', help)
+            for endpoint, stats in endpoints:
+                sample(name, [('endpoint', endpoint)], stats[key])
+
+        name = 'testrail_request_duration_seconds'
+        header(name, 'histogram', 'TestRail requests duration')
+        for endpoint, stats in endpoints:
+            total = 0
+            for bound, count in zip(BUCKETS, stats['buckets'].values()):
+                total += count
+                le = '+Inf' if bound == float('inf') else bound
+                sample(name + '_bucket', [('endpoint', endpoint),
+                                          ('le', le)], total)
+            sample(name + '_sum', [('endpoint', endpoint)], stats['time'])
+            sample(name + '_count', [('endpoint', endpoint)],
+                   stats['count'])
+
+        name = 'testrail_sleep_seconds_total'
+        header(name, 'counter', 'Time slept before TestRail requests')
+        for reason, seconds in sorted(data['sleeps'].items()):
+            sample(name, [('reason', reason)], seconds)
+
+        name = 'report_phase_seconds'
+        header(name, 'gauge', 'Report phase wall time')
+        for phase, seconds in data['phases'].items():
+            sample(name, [('phase', phase)], seconds)
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """Save stats to JSON (`.json` path) or Prometheus textfile."""
+        if path.endswith('.json'):
+            content = json.dumps(self.to_dict(), indent=2)
+        else:
+            content = self.to_prometheus()
+        # exporter never reads partial file
+        atomic_write(path, content)
@@ -0,0 +1,115 @@
+"""Asyncio TestRail client (Python 3.5+).
+
+Requests are made by synchronous `Client` in thread pool executor, so all
+coroutines share one `requests.Session` connection pool, rate limiter and
+retry logic. Returned items are usual `Item` objects.
+"""
+from __future__ import absolute_import
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+
+from .client import Client
+
+
+class AsyncCollection(object):
+    """Asyncio counterpart of `Collection`."""
+
+    def __init__(self, client, collection):
+        self._client = client
+        self._collection = collection
+
+    def __repr__(self):
+        return '<AsyncCollection of {}>'.format(
+            self._collection._item_class.__name__)
+
+    async def __call__(self, id=None, workers=1):
+        return await self._client.run(self._collection, id, workers=workers)
+
+    async def list(self, workers=1):
+        return await self._client.run(self._collection.list, workers=workers)
+
+    async def get(self, id):
+        return await self._client.run(self._collection.get, id)
+
+    async def find(self, **kwargs):
+        return await self._client.run(self._collection.find, **kwargs)
+
+    async def find_all(self, **kwargs):
+        return await self._client.run(self._collection.find_all, **kwargs)
+
+    async def add(self, **kwargs):
+        return await self._client.run(self._collection.add, **kwargs)
+
+
+class AsyncClient(object):
+    """Asyncio TestRail API client.
+
+    Arguments are the same as for `Client`. Up to `pool_size` requests
+    are made at once. Existing client can be wrapped with `from_client`.
+    """
+
+    def __init__(self, base_url, username, password, pool_size=10,
+                 **kwargs):
+        self._init(Client(base_url, username, password, pool_size=pool_size,
+                          **kwargs), pool_size, owns_client=True)
+
+    def _init(self, client, pool_size, owns_client):
+        self.client = client
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+        self._owns_client = owns_client
+
+    @classmethod
+    def from_client(cls, client):
+        """Make asyncio client, which uses `client` session."""
+        self = cls.__new__(cls)
+        self._init(client, client.pool_size, owns_client=False)
+        return self
+
+    def run(self, func, *args, **kwargs):
+        """Call `func` in executor, return awaitable future."""
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs))
+
+    def collection(self, collection):
+        """Wrap synchronous collection (e.g. `project.suites`)."""
+        return AsyncCollection(self, collection)
+
+    @property
+    def projects(self):
+        return self.collection(self.client.projects)
+
+    async def statuses(self):
+        return await self.run(lambda: self.client.statuses)
+
+    async def gather_stages(self, stages):
+        """Call functions of each stage concurrently, stage by stage.
+
+        Next stage starts only after all functions of previous one are
+        done, so it can use their results. Returns results lists.
+        """
+        results = []
+        for stage in stages:
+            results.append(
+                await asyncio.gather(*[self.run(func) for func in stage]))
+        return results
+
+    def run_stages(self, stages):
+        """Synchronous version of `gather_stages` for non-async code."""
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.gather_stages(stages))
+        finally:
+            loop.close()
+
+    def close(self):
+        self.executor.shutdown()
+        if self._owns_client:
+            self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
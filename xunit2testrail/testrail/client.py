@@ -1,10 +1,21 @@
 from __future__ import absolute_import
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+import json
 import logging
 import time
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from ..stats import endpoint_name
+from ..stats import Stats
+from .exceptions import AddError
 from .exceptions import NotFound
+from .ratelimit import backoff_delay
+from .ratelimit import is_connect_error
+from .ratelimit import RateLimiter
+from .ratelimit import retry_after
 
 logger = logging.getLogger(__name__)
 
@@ -25,11 +36,10 @@ class ItemSet(list):
         return filtered
 
     def find(self, **kwargs):
-        items = self.find_all(**kwargs)
-        if items:
-            return items[0]
-        else:
-            raise NotFound(self._item_class, **kwargs)
+        for x in self:
+            if all(getattr(x, k) == v for k, v in kwargs.items()):
+                return x
+        raise NotFound(self._item_class, **kwargs)
 
 
 class Collection(object):
@@ -37,17 +47,22 @@ class Collection(object):
     _list_url = 'get_{name}s'
     _add_url = 'add_{name}'
 
-    def __init__(self, item_class=None, parent_id=None, **kwargs):
+    def __init__(self, item_class=None, parent_id=None, client=None,
+                 **kwargs):
         self._item_class = item_class
-        self._handler = self._item_class._handler
+        self._client = client
         self.parent_id = parent_id
         for k, v in kwargs.items():
             setattr(self, k, v)
 
-    def __call__(self, id=None):
+    @property
+    def _handler(self):
+        return _client_handler(self._client, self)
+
+    def __call__(self, id=None, workers=1):
         name = self._item_class._api_name()
         if id is None:
-            items = self._list(name)
+            items = self._list(name, workers=workers)
             if 'error' in items:
                 raise Exception(items)
             items = ItemSet(self._to_object(x) for x in items)
@@ -55,20 +70,112 @@ class Collection(object):
             return items
 
         else:
-            return self._item_class.get(id)
+            return self.get(id)
 
     def __repr__(self):
         return '<Collection of {}>'.format(self._item_class.__name__)
 
     def _to_object(self, data):
-        return self._item_class(**data)
+        item = self._item_class(**data)
+        item._client = self._client
+        return item
 
-    def _list(self, name, params=None):
-        params = params or {}
+    def _url(self, name):
         url = self._list_url.format(name=name)
         if self.parent_id is not None:
             url += '/{}'.format(self.parent_id)
-        return self._handler('GET', url, params=params)
+        return url
+
+    @staticmethod
+    def _page_items(name, page):
+        """Return items list from paginated response."""
+        if name + 's' in page:
+            return page[name + 's']
+        lists = [v for k, v in page.items() if isinstance(v, list)]
+        return lists[0] if lists else []
+
+    @staticmethod
+    def _next_page_url(page):
+        next_url = (page.get('_links') or {}).get('next')
+        if next_url:
+            return next_url.split('/api/v2/', 1)[-1]
+
+    def _iter_pages(self, name, params=None):
+        """Yield items lists page by page.
+
+        Newer TestRail returns bulk lists in pages with link to the next
+        page in `_links.next`. Older one returns whole list without
+        pagination (or error dict) - it is yielded as is.
+        """
+        url = self._url(name)
+        params = params or {}
+        while url is not None:
+            page = self._handler('GET', url, params=params)
+            if not isinstance(page, dict) or '_links' not in page:
+                yield page
+                return
+            yield self._page_items(name, page)
+            url = self._next_page_url(page)
+            params = {}
+
+    def _iter_pages_concurrent(self, name, params=None, workers=4):
+        """Yield items lists page by page, prefetching next pages.
+
+        After first page next `workers` pages are requested at once by
+        offset, until short or last page is received.
+        """
+        url = self._url(name)
+        params = params or {}
+        page = self._handler('GET', url, params=params)
+        if not isinstance(page, dict) or '_links' not in page:
+            yield page
+            return
+        items = self._page_items(name, page)
+        yield items
+        limit = page.get('limit') or len(items)
+        if not limit or self._next_page_url(page) is None:
+            return
+        offset = (page.get('offset') or 0) + limit
+
+        def get_page(offset):
+            page_params = dict(params, offset=offset, limit=limit)
+            page = self._handler('GET', url, params=page_params)
+            if 'error' in page:
+                raise Exception(page)
+            return page
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                offsets = [offset + limit * i for i in range(workers)]
+                for page in executor.map(get_page, offsets):
+                    items = self._page_items(name, page)
+                    yield items
+                    if len(items) < limit or \
+                            self._next_page_url(page) is None:
+                        return
+                offset = offsets[-1] + limit
+
+    def _list(self, name, params=None, workers=1):
+        if workers > 1:
+            pages = self._iter_pages_concurrent(name, params, workers)
+        else:
+            pages = self._iter_pages(name, params)
+        items = []
+        for page in pages:
+            if isinstance(page, dict):
+                # error response
+                return page
+            items.extend(page)
+        return items
+
+    def iter(self, params=None):
+        """Lazily yield items, requesting next page only when needed."""
+        name = self._item_class._api_name()
+        for page in self._iter_pages(name, params):
+            if isinstance(page, dict):
+                raise Exception(page)
+            for data in page:
+                yield self._to_object(data)
 
     def _add(self, name, data, **kwargs):
         url = self._add_url.format(name=name)
@@ -88,58 +195,126 @@ class Collection(object):
         return self().find(**kwargs)
 
     def get(self, id):
-        return self._item_class.get(id)
+        return self._item_class.get(id, self._client)
 
     def add(self, **kwargs):
         item = self._to_object(kwargs)
         result = self._add(item._api_name(), item.data)
         return self._to_object(result)
 
-    def list(self):
+    def list(self, workers=1):
         name = self._item_class._api_name()
-        return ItemSet([self._item_class(**i) for i in self._list(name=name)])
+        return ItemSet([self._to_object(i)
+                        for i in self._list(name=name, workers=workers)])
+
+
+def _client_handler(client, owner):
+    if client is None:
+        raise ValueError('{!r} is not bound to TestRail client'.format(owner))
+    return client._query
+
+
+# max number of shared custom fields schemas; registry is cleared when it
+# is full (items keep references to their schemas), so it doesn't grow
+# in long running process
+MAX_CUSTOM_SCHEMAS = 1024
+
+_custom_schemas = {}
+
+
+def _custom_schema(names):
+    """Return name to index map, shared by all items with same fields."""
+    schema = _custom_schemas.get(names)
+    if schema is None:
+        if len(_custom_schemas) >= MAX_CUSTOM_SCHEMAS:
+            _custom_schemas.clear()
+        schema = _custom_schemas.setdefault(
+            names, dict((name, i) for i, name in enumerate(names)))
+    return schema
+
+
+class ItemData(dict):
+    """Read-only snapshot of item fields.
+
+    Changes of snapshot wouldn't change item, so they are forbidden; item
+    attributes should be set instead.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('Item data is read-only, set item attributes or '
+                        'change a copy (dict(item.data))')
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
 
 
 class Item(object):
+    """TestRail item.
+
+    Known item fields (listed in `_fields`) are stored in slots. Other
+    (custom) fields are stored compactly as values tuple and name to index
+    map, shared by all items with the same custom fields. Fields set after
+    item creation, which are not known, are stored to `__dict__`. All
+    fields are available as attributes and as `data` dict.
+
+    Items, received from API, are bound to client, which received them;
+    all their requests are made by this client.
+    """
+    __slots__ = ('id', '_client', '_custom_index', '_custom_values',
+                 '__dict__')
+    _fields = ()
     _get_url = 'get_{name}/{id}'
     _update_url = 'update_{name}/{id}'
-    _handler = None
     _repr_field = 'name'
 
     def __init__(self, id=None, **kwargs):
         self.id = id
-        self._data = kwargs
+        self._client = None
+        cls = type(self)
+        custom_names = []
+        custom_values = []
+        for name, value in kwargs.items():
+            if isinstance(getattr(cls, name, None), _slot_type):
+                setattr(self, name, value)
+            else:
+                custom_names.append(name)
+                custom_values.append(value)
+        self._custom_index = _custom_schema(tuple(custom_names))
+        self._custom_values = tuple(custom_values)
+
+    def __getattr__(self, name):
+        # called only for fields, which are not in slots or __dict__
+        if name.startswith('_custom'):
+            raise AttributeError(name)
+        index = self._custom_index.get(name)
+        if index is None:
+            raise AttributeError(name)
+        return self._custom_values[index]
 
     @classmethod
     def _api_name(cls):
         return cls.__name__.lower()
 
-    def __getattr__(self, name):
-        if name in self._data:
-            return self._data[name]
-        else:
-            raise AttributeError
-
-    def __setattr__(self, name, value):
-        if '_data' in self.__dict__ and name not in self.__dict__:
-            self.__dict__['_data'][name] = value
-        else:
-            self.__dict__[name] = value
-
     def __repr__(self):
         name = getattr(self, self._repr_field, '')
         name = repr(name)
         return '<{c.__name__}({s.id}) {name} at 0x{id:x}>'.format(
             s=self, c=self.__class__, id=id(self), name=name)
 
+    @property
+    def _handler(self):
+        return _client_handler(self._client, self)
+
     @classmethod
-    def get(cls, id):
+    def get(cls, id, client):
         name = cls._api_name()
         url = cls._get_url.format(name=name, id=id)
-        result = cls._handler('GET', url)
+        result = _client_handler(client, cls)('GET', url)
         if 'error' in result:
             raise Exception(result)
-        return cls(**result)
+        item = cls(**result)
+        item._client = client
+        return item
 
     def update(self):
         url = self._update_url.format(name=self._api_name(), id=self.id)
@@ -147,50 +322,128 @@ class Item(object):
 
     @property
     def data(self):
-        return self._data
+        """All item fields (except id) as read-only `ItemData`."""
+        data = {}
+        for name in self._fields:
+            try:
+                data[name] = getattr(self, name)
+            except AttributeError:
+                # field is not set
+                pass
+        for name, index in self._custom_index.items():
+            data[name] = self._custom_values[index]
+        data.update(self.__dict__)
+        return ItemData(data)
+
+
+_slot_type = type(Item.id)
 
 
 class Project(Item):
+    __slots__ = _fields = ('name', 'announcement', 'show_announcement',
+                           'is_completed', 'completed_on', 'suite_mode',
+                           'url')
+
     @property
     def suites(self):
-        return Collection(Suite, parent_id=self.id)
+        return Collection(Suite, parent_id=self.id, client=self._client)
 
     @property
     def plans(self):
-        return Collection(Plan, parent_id=self.id)
+        return Collection(Plan, parent_id=self.id, client=self._client)
 
     @property
     def runs(self):
-        return Collection(Run, parent_id=self.id)
+        return Collection(Run, parent_id=self.id, client=self._client)
 
     @property
     def milestones(self):
-        return Collection(Milestone, parent_id=self.id)
+        return Collection(Milestone, parent_id=self.id, client=self._client)
 
     @property
     def configs(self):
-        return Collection(Config, parent_id=self.id)
+        return Collection(Config, parent_id=self.id, client=self._client)
 
 
 class Suite(Item):
+    __slots__ = _fields = ('name', 'description', 'project_id', 'is_master',
+                           'is_baseline', 'is_completed', 'completed_on',
+                           'url')
+
     @property
     def cases(self):
         return CaseCollection(
             Case,
+            client=self._client,
             _list_url='get_cases/{}&suite_id={}'.format(self.project_id,
                                                         self.id))
 
+    @property
+    def sections(self):
+        return Collection(
+            Section,
+            client=self._client,
+            _list_url='get_sections/{}&suite_id={}'.format(self.project_id,
+                                                           self.id),
+            _add_url='add_section/{}'.format(self.project_id))
+
+
+class Section(Item):
+    __slots__ = _fields = ('name', 'description', 'suite_id', 'parent_id',
+                           'depth', 'display_order')
+
 
 class CaseCollection(Collection):
     def _add(self, name, data, **kwargs):
         url = self._add_url.format(name=name)
+        data = dict(data)
         section_id = data.pop('section_id')
         data.pop('result', None)
         url = '{}/{}'.format(url, section_id)
         return self._handler('POST', url, json=data, **kwargs)
 
+    def updated_after(self, timestamp):
+        """Return True if any case was updated after `timestamp`.
+
+        Only one case is requested. Deleted cases are not detected, as
+        TestRail doesn't return them.
+        """
+        for _ in self.iter({'updated_after': timestamp, 'limit': 1}):
+            return True
+        return False
+
+    def add_many(self, cases_data, section_id, workers=4):
+        """Add cases to section, up to `workers` requests at once.
+
+        TestRail has no bulk cases creation, so each case is added by
+        separate request (paced by client rate limiter). Returns created
+        cases in `cases_data` order. If some cases are not created,
+        `AddError` with created ones is raised.
+        """
+        def add(data):
+            return self.add(section_id=section_id, **data)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(add, x) for x in cases_data]
+        added = []
+        error = None
+        for future in futures:
+            if future.exception() is not None:
+                error = error or future.exception()
+                added.append(None)
+            else:
+                added.append(future.result())
+        if error is not None:
+            raise AddError(error, added)
+        return added
+
 
 class Case(Item):
+    _fields = ('title', 'section_id', 'template_id', 'type_id',
+               'priority_id', 'milestone_id', 'refs', 'created_by',
+               'created_on', 'updated_by', 'updated_on', 'estimate',
+               'estimate_forecast', 'suite_id', 'display_order', 'is_deleted')
+    __slots__ = _fields + ('result', )
     _repr_field = 'title'
 
     def __init__(self, *args, **kwargs):
@@ -202,6 +455,12 @@ class Case(Item):
 
 
 class Plan(Item):
+    __slots__ = _fields = ('name', 'description', 'milestone_id',
+                           'assignedto_id', 'is_completed', 'completed_on',
+                           'passed_count', 'blocked_count', 'untested_count',
+                           'retest_count', 'failed_count', 'project_id',
+                           'created_on', 'created_by', 'url', 'entries')
+
     def __init__(self,
                  name,
                  description=None,
@@ -220,17 +479,41 @@ class Plan(Item):
 
     @property
     def runs(self):
-        return ItemSet([Run.get(id=run['id'])
-                        for entry in self.entries for run in entry['runs']])
-
-    def add_run(self, run):
-        url = 'add_plan_entry/{}'.format(self.id)
+        runs = ItemSet(self.iter_runs())
+        runs._item_class = Run
+        return runs
+
+    def iter_runs(self):
+        """Yield plan runs, built from entries data of plan itself.
+
+        `get_plan` response already contains all runs fields, so no
+        additional requests are made.
+        """
+        for entry in self.entries:
+            for run in entry['runs']:
+                data = dict(run)
+                data.setdefault('plan_id', self.id)
+                data.setdefault('suite_id', entry.get('suite_id'))
+                run = Run(**data)
+                run._client = self._client
+                yield run
+
+    def find_run(self, **kwargs):
+        """Return first plan run, matched to conditions."""
+        for run in self.iter_runs():
+            if all(getattr(run, k, None) == v for k, v in kwargs.items()):
+                return run
+        raise NotFound(Run, **kwargs)
+
+    @staticmethod
+    def entry_data(run):
+        """Return plan entry data (for add_plan_entry or add_plan) of run."""
         run_data = {
             k: v
             for k, v in run.data.items()
             if k in ('case_ids', 'config_ids', 'name', 'description')
         }
-        request = {
+        return {
             "suite_id": run.suite_id,
             "name": run.name,
             "description": run.description,
@@ -239,10 +522,26 @@ class Plan(Item):
             "case_ids": run.data['case_ids'],
             "runs": [run_data],
         }
-        result = self._handler('POST', url, json=request)
-        new_run_data = result['runs'][0]
-        run.id = new_run_data.pop('id')
-        run.data.update(new_run_data)
+
+    def _bind_run(self, run, run_data):
+        run_data = dict(run_data)
+        run._client = self._client
+        run.id = run_data.pop('id')
+        for name, value in run_data.items():
+            setattr(run, name, value)
+
+    def add_run(self, run):
+        url = 'add_plan_entry/{}'.format(self.id)
+        result = self._handler('POST', url, json=self.entry_data(run))
+        self._bind_run(run, result['runs'][0])
+
+    def bind_runs(self, runs):
+        """Bind runs to runs of plan entries, created with plan.
+
+        `runs` are in order of `entries`, which plan was added with.
+        """
+        for run, entry in zip(runs, self.entries):
+            self._bind_run(run, entry['runs'][0])
 
     def update_run(self, run):
         entry = [_entry
@@ -254,6 +553,15 @@ class Plan(Item):
 
 
 class Run(Item):
+    __slots__ = _fields = ('suite_id', 'milestone_id', 'config_ids', 'name',
+                           'description', 'include_all', 'case_ids',
+                           'assignedto_id', 'is_completed', 'completed_on',
+                           'config', 'passed_count', 'blocked_count',
+                           'untested_count', 'retest_count', 'failed_count',
+                           'project_id', 'plan_id', 'entry_id',
+                           'entry_index', 'created_on', 'created_by',
+                           'updated_on', 'refs', 'url')
+
     def __init__(self,
                  suite_id=None,
                  milestone_id=None,
@@ -276,19 +584,32 @@ class Run(Item):
 
     @property
     def tests(self):
-        return Collection(Test, parent_id=self.id)
+        return Collection(Test, parent_id=self.id, client=self._client)
 
     @property
     def results(self):
-        return ResultCollection(Result, parent_id=self.id)
+        return ResultCollection(Result, parent_id=self.id, client=self._client)
+
+    def add_results_for_cases(self, cases, delta=False,
+                              compare_comments=False, **kwargs):
+        """Add cases results to run, adding missing cases first.
 
-    def add_results_for_cases(self, cases):
+        In `delta` mode only results with status (and comment, if
+        `compare_comments` is set) other than current test one are sent.
+
+        Other keyword arguments are passed to
+        `ResultCollection.add_for_cases`.
+        """
+        tests = None
+        if delta or not self.include_all:
+            tests = self.tests.list()
         if not self.include_all:
             # IDs can't be taken from self.case_ids set because it's always
             # empty now, see https://goo.gl/uunbEH
-            cases_ids = [test.case_id for test in self.tests.list()]
+            cases_ids = [test.case_id for test in tests]
+            run_cases_ids = set(cases_ids)
             missing_cases_ids = [case.id for case in cases
-                                 if case.id not in cases_ids]
+                                 if case.id not in run_cases_ids]
             if missing_cases_ids:
                 logger.debug('Adding {0} missing test cases '
                              'to the run'.format(len(missing_cases_ids)))
@@ -300,38 +621,133 @@ class Run(Item):
                         raise
                     # error 403 'operation is not allowed' means that the run
                     # belongs to some plan and can't be edited independently
-                    Plan.get(id=self.plan_id).update_run(run=self)
-        return self.results.add_for_cases(self.id, cases)
+                    Plan.get(self.plan_id, self._client).update_run(run=self)
+        if delta:
+            cases = self.changed_cases(cases, tests, compare_comments)
+            if not cases:
+                return []
+        return self.results.add_for_cases(self.id, cases, **kwargs)
+
+    def changed_cases(self, cases, tests=None, compare_comments=False):
+        """Return cases, which result differs from current test state.
+
+        Current statuses are taken from run tests, comments (if
+        `compare_comments` is set) - from latest results of run tests.
+        """
+        if tests is None:
+            tests = self.tests.list()
+        statuses = {x.case_id: x.status_id for x in tests}
+        comments = {}
+        if compare_comments:
+            case_ids = {x.id: x.case_id for x in tests}
+            # results are ordered from newest to oldest
+            for result in self.results.iter():
+                case_id = case_ids.get(result.test_id)
+                if case_id not in comments:
+                    comments[case_id] = result.comment
+        changed = []
+        for case in cases:
+            if case.result is None:
+                continue
+            is_changed = statuses.get(case.id) != case.result.status_id
+            if compare_comments and not is_changed:
+                is_changed = comments.get(case.id) != case.result.comment
+            if is_changed:
+                changed.append(case)
+        logger.info('{} of {} results are changed in run {}'.format(
+            len(changed), len(cases), self.id))
+        return changed
 
 
 class Test(Item):
-    pass
+    __slots__ = _fields = ('case_id', 'status_id', 'assignedto_id', 'run_id',
+                           'title', 'template_id', 'type_id', 'priority_id',
+                           'estimate', 'estimate_forecast', 'refs',
+                           'milestone_id')
+    _repr_field = 'title'
 
 
 class ResultCollection(Collection):
 
     _list_url = 'get_results_for_run'
 
-    def add_for_cases(self, run_id, cases):
+    def add_for_cases(self, run_id, cases, batch_size=250,
+                      batch_bytes=4 * 1024 * 1024, workers=1, journal=None):
+        """Add cases results to run.
+
+        Results are sent in batches of not more than `batch_size` results
+        and `batch_bytes` bytes of JSON body, up to `workers` batches at
+        once. Failed batches are retried by client (see `Client._query`).
+
+        With `journal` (ResultJournal) results, which are already sent, are
+        skipped and each acknowledged batch is recorded, even if other
+        batches are failed.
+        """
         if len(cases) == 0:
             logger.warning('No cases with result for run {}'.format(run_id))
-            return
+            return []
         results = []
         for case in cases:
             if case.result is None:
                 continue
-            result = case.result.data
-            result['case_id'] = case.id
+            result = dict(case.result.data, case_id=case.id)
             results.append(result)
-        if results is not None:
-            url = 'add_results_for_cases/{}'.format(run_id)
-            result = self._handler('POST', url, json={'results': results})
-            return [self._to_object(x) for x in result]
-        else:
+        if journal is not None:
+            results = journal.unsent(self._client.base_url, run_id, results)
+        if not results:
             return []
+        url = 'add_results_for_cases/{}'.format(run_id)
+        batches = list(split_batches(results, batch_size, batch_bytes))
+        logger.debug('Sending {} results to run {} in {} batches'.format(
+            len(results), run_id, len(batches)))
+
+        created = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self._send_batch, url, batch): i
+                       for i, batch in enumerate(batches)}
+            # each batch is recorded as soon as it is acknowledged, so
+            # interrupted upload is resumed from not recorded batches
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                i = futures[future]
+                if journal is not None:
+                    journal.record(self._client.base_url, run_id, batches[i])
+                created[i] = future.result()
+        if error is not None:
+            raise error
+        return [self._to_object(x)
+                for i in sorted(created) for x in created[i]]
+
+    def _send_batch(self, url, batch):
+        return self._handler('POST', url, json={'results': batch})
+
+
+def split_batches(results, batch_size, batch_bytes):
+    """Split results to lists limited by items count and JSON size."""
+    batch = []
+    size = 0
+    for result in results:
+        result_size = len(json.dumps(result)) + 2
+        is_full = len(batch) >= batch_size
+        is_full = is_full or size + result_size > batch_bytes
+        if batch and is_full:
+            yield batch
+            batch = []
+            size = 0
+        batch.append(result)
+        size += result_size
+    if batch:
+        yield batch
 
 
 class Result(Item):
+    __slots__ = _fields = ('status_id', 'comment', 'version', 'elapsed',
+                           'defects', 'assignedto_id', 'test_id',
+                           'created_by', 'created_on')
+
     def __init__(self,
                  status_id,
                  comment=None,
@@ -355,39 +771,142 @@ class Result(Item):
 
 
 class Milestone(Item):
-    pass
+    __slots__ = _fields = ('name', 'description', 'project_id', 'due_on',
+                           'start_on', 'started_on', 'is_started',
+                           'is_completed', 'completed_on', 'parent_id', 'url')
 
 
 class Config(Item):
-    pass
+    __slots__ = _fields = ('name', 'project_id', 'configs')
 
 
 class Client(object):
-    def __init__(self, base_url, username, password):
+    """TestRail API client.
+
+    All requests are made through one `requests.Session`, so connections to
+    TestRail are kept alive and reused by all items and collections.
+
+    Requests are paced by one rate limiter, shared by all threads, which use
+    client. Responses with 429 status pause all requests for `Retry-After`
+    seconds; 5xx statuses and connection errors are retried with
+    exponential backoff. Not idempotent requests (`add_*`), which could be
+    applied by server, are retried only after 503 status or failed
+    connection.
+
+    :param pool_size: max number of connections to keep open
+    :param gzip: accept compressed responses (as `requests` does by
+        default); False disables compression, e.g. for debugging
+    :param rate_limit: max requests per minute (None - unlimited)
+    :param max_tries: max number of tries of single request
+    :param backoff: base delay (in seconds) of exponential backoff
+    :param adapter: `requests` transport adapter to share its connection
+        pool with other clients (new one is created by default)
+    :param stats: `Stats` to record requests to (new one by default)
+    :param timeout: seconds to wait for connection or response (None -
+        wait forever)
+    """
+
+    retry_statuses = (500, 502, 503, 504)
+    # statuses, which mean that request is not applied by server
+    safe_retry_statuses = (503, )
+
+    def __init__(self, base_url, username, password, pool_size=10,
+                 gzip=True, rate_limit=None, max_tries=5, backoff=1.0,
+                 adapter=None, stats=None, timeout=None):
         self.username = username
         self.password = password
         self.base_url = base_url.rstrip('/') + '/index.php?/api/v2/'
-
-        Item._handler = self._query
+        self.pool_size = pool_size
+        self._owns_adapter = adapter is None
+        self.session = self._make_session(pool_size=pool_size, gzip=gzip,
+                                          adapter=adapter)
+        self.rate_limiter = RateLimiter(
+            rate=rate_limit / 60.0 if rate_limit else None,
+            burst=pool_size)
+        self.max_tries = max_tries
+        self.backoff = backoff
+        self.stats = stats if stats is not None else Stats()
+        self.timeout = timeout
+
+    def _make_session(self, pool_size, gzip, adapter=None):
+        session = requests.Session()
+        session.auth = (self.username, self.password)
+        session.headers['Content-type'] = 'application/json'
+        if not gzip:
+            session.headers['Accept-Encoding'] = 'identity'
+        if adapter is None:
+            adapter = HTTPAdapter(pool_connections=pool_size,
+                                  pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def close(self):
+        # shared adapter is closed by its owner
+        if self._owns_adapter:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def _query(self, method, url, **kwargs):
+        endpoint = endpoint_name(url)
+        idempotent = method != 'POST' or not endpoint.startswith('add_')
         url = self.base_url + url
-        headers = {'Content-type': 'application/json'}
         logger.debug('Make {} request to {}'.format(method, url))
-        for _ in range(5):
-            response = requests.request(
-                method,
-                url,
-                allow_redirects=False,
-                auth=(self.username, self.password),
-                headers=headers,
-                **kwargs)
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(self.max_tries):
+            is_last = attempt == self.max_tries - 1
+            if attempt:
+                self.stats.record_retry(endpoint)
+            self.stats.record_sleep('throttle', self.rate_limiter.acquire())
+            start = time.time()
+            try:
+                response = self.session.request(
+                    method,
+                    url,
+                    allow_redirects=False,
+                    **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.stats.record_request(endpoint, time.time() - start)
+                if is_last or not (idempotent or is_connect_error(e)):
+                    raise
+                delay = backoff_delay(attempt, self.backoff)
+                logger.warning('{} for {}, retry in {:.1f}s'.format(
+                    e.__class__.__name__, url, delay))
+                self.stats.record_sleep('backoff', delay)
+                time.sleep(delay)
+                continue
+            self.stats.record_request(
+                endpoint, time.time() - start,
+                status=response.status_code,
+                sent=len(response.request.body or b''),
+                received=len(response.content))
             # To many requests
             if response.status_code == 429:
-                time.sleep(60)
+                delay = retry_after(response)
+                if delay is None:
+                    delay = backoff_delay(attempt, self.backoff)
+                logger.warning('Too many requests, pause for {:.1f}s'.format(
+                    delay))
+                if not is_last:
+                    self.rate_limiter.pause(delay)
                 continue
+            if idempotent:
+                is_retried = response.status_code in self.retry_statuses
             else:
-                break
+                is_retried = response.status_code in self.safe_retry_statuses
+            if is_retried and not is_last:
+                delay = backoff_delay(attempt, self.backoff)
+                logger.warning('Status {} for {}, retry in {:.1f}s'.format(
+                    response.status_code, url, delay))
+                self.stats.record_sleep('backoff', delay)
+                time.sleep(delay)
+                continue
+            break
         # Redirect or error
         if response.status_code >= 300:
             raise requests.HTTPError("Wrong response:\n"
@@ -402,7 +921,7 @@ class Client(object):
 
     @property
     def projects(self):
-        return Collection(Project)
+        return Collection(Project, client=self)
 
     @property
     def statuses(self):
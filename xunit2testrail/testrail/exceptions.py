@@ -9,3 +9,16 @@ class NotFound(Exception):
         return u'{type} with {conditions}'.format(
             type=self.item_class._api_name().title(),
             conditions=conditions)
+
+
+class AddError(Exception):
+    """Some of items are not added.
+
+    `added` is a list of added items (None for not added ones) in order of
+    items data, `error` - first error.
+    """
+
+    def __init__(self, error, added):
+        super(AddError, self).__init__(str(error))
+        self.error = error
+        self.added = added
@@ -0,0 +1,67 @@
+from __future__ import absolute_import
+import random
+import threading
+import time
+
+import requests
+from requests.packages.urllib3.exceptions import NewConnectionError
+
+
+class RateLimiter(object):
+    """Thread-safe token bucket, shared by all requests of a client.
+
+    :param rate: max requests per second (None - unlimited)
+    :param burst: number of requests, which can be made at once
+    """
+
+    def __init__(self, rate=None, burst=1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._lock = threading.Lock()
+        self._next_time = 0
+        self._paused_until = 0
+
+    def acquire(self):
+        """Wait for request slot. Return waited time (in seconds)."""
+        with self._lock:
+            now = time.time()
+            start = max(now, self._paused_until)
+            if self.rate:
+                interval = 1.0 / self.rate
+                next_time = max(self._next_time, now)
+                start = max(start, next_time - (self.burst - 1) * interval)
+                self._next_time = max(next_time, start) + interval
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+            return delay
+        return 0
+
+    def pause(self, seconds):
+        """Block all requests for `seconds` (e.g. from Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until,
+                                     time.time() + seconds)
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Exponential backoff delay with jitter for `attempt` (from 0)."""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def retry_after(response):
+    """Return Retry-After header value in seconds (or None)."""
+    value = response.headers.get('Retry-After')
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_connect_error(error):
+    """Return True if request failed before it was sent to server."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0] if error.args else None, 'reason', None)
+    return isinstance(reason, NewConnectionError)
@@ -1,12 +1,20 @@
 import abc
-import re
-from uuid import UUID
 from collections import defaultdict
+from collections import OrderedDict
+from datetime import timedelta
+import functools
+import glob
 import logging
+import os
+import re
+import string
+import tempfile
+from uuid import UUID
 
-import prettytable
 import six
 
+from .vendor import xunitparser
+
 logger = logging.getLogger(__name__)
 
 
@@ -62,17 +70,22 @@ class NotNoneValue(object):
         return self._value
 
 
+def describe_xunit_case(case):
+    """Return xunit case template fields."""
+    xunit_dict = {
+        'classname': case.classname,
+        'methodname': case.methodname,
+        'id': case.report_id or find_id(case.methodname),
+        'uuid': find_uuid(case.methodname)
+    }
+
+    return {k: NotNoneValue(v) for k, v in xunit_dict.items()}
+
+
 @six.add_metaclass(abc.ABCMeta)
 class CaseMapper(object):
     def describe_xunit_case(self, case):
-        xunit_dict = {
-            'classname': case.classname,
-            'methodname': case.methodname,
-            'id': case.report_id or find_id(case.methodname),
-            'uuid': find_uuid(case.methodname)
-        }
-
-        return {k: NotNoneValue(v) for k, v in xunit_dict.items()}
+        return describe_xunit_case(case)
 
     def describe_testrail_case(self, case):
         return {
@@ -81,6 +94,8 @@ class CaseMapper(object):
         }
 
     def print_pair_data(self, testrail_case, xunit_case):
+        import prettytable
+
         testrail_fields = self.describe_testrail_case(testrail_case)
         print('Available TestRail fields (case {.id}):'.format(testrail_case))
         pt = prettytable.PrettyTable(field_names=['Name', 'Value'])
@@ -133,11 +148,28 @@ class CaseMapper(object):
     def get_suitable_cases(self, xunit_case, cases):
         """Return all suitable testrail cases for xunit case."""
 
+    def new_case_data(self, xunit_case):
+        """Return fields of new testrail case, matched to xunit case.
+
+        Returns None if such case can't be made (default implementation
+        makes no cases).
+        """
+        return None
+
+    def index_cases(self, cases):
+        """Prepare testrail cases for repeated `get_suitable_cases` calls.
+
+        Returned value is passed to `get_suitable_cases` instead of original
+        cases list. Default implementation does nothing.
+        """
+        return cases
+
     def map(self, xunit_suite, testrail_cases, allow_duplicates=False):
         mapping = []
+        indexed_cases = self.index_cases(testrail_cases)
         for xunit_case in xunit_suite:
             suitable_cases = self.get_suitable_cases(xunit_case,
-                                                     testrail_cases)
+                                                     indexed_cases)
             if len(suitable_cases) == 0:
                 logger.warning(
                     "xUnit case `{0}` doesn't match "
@@ -158,6 +190,16 @@ class TemplateCaseMapper(CaseMapper):
         super(TemplateCaseMapper, self).__init__(**kwargs)
         self.xunit_name_template = xunit_name_template
         self.testrail_name_template = testrail_name_template
+        self._index = None
+
+    def index_cases(self, cases):
+        # index is reused while mapper is called with the same cases list
+        index = self._index
+        if index is None or index.cases is not cases:
+            index = self._index = TemplateCaseIndex(
+                cases, self.testrail_name_template,
+                self.describe_testrail_case)
+        return index
 
     def get_suitable_cases(self, xunit_case, cases):
         xunit_dict = self.describe_xunit_case(xunit_case)
@@ -169,30 +211,128 @@ class TemplateCaseMapper(CaseMapper):
                     e=e, template=self.xunit_name_template, case=xunit_case))
             return []
 
-        # Search symbols groups, which is absent in xunit_id
-        split_symbols_base = [r'a-zA-Z', r'\(\)', r'\[\]', r',', ]
+        if not isinstance(cases, TemplateCaseIndex):
+            cases = self.index_cases(cases)
+        return cases.lookup(xunit_id)
+
+    def _testrail_template_field(self):
+        parts = list(string.Formatter().parse(self.testrail_name_template))
+        field = parts[0][1] if len(parts) == 1 else None
+        if not field or parts[0] != ('', field, '', None):
+            raise ValueError(
+                "Can't make testrail case for template {!r}, only single "
+                "field template (like '{{custom_report_label}}') is "
+                "supported".format(self.testrail_name_template))
+        return field
+
+    def new_case_data(self, xunit_case):
+        """Return title and testrail template field of new case.
+
+        Template field is set to xunit case id string, so new case is
+        matched to xunit case.
+        """
+        field = self._testrail_template_field()
+        xunit_dict = self.describe_xunit_case(xunit_case)
+        try:
+            xunit_id = self.xunit_name_template.format(**xunit_dict)
+        except NoneValueException:
+            return None
+        data = {'title': xunit_case.methodname[:250]}
+        data[field] = xunit_id
+        return data
+
+
+class TemplateCaseIndex(object):
+    """TestRail cases index by template id string and its groups.
+
+    TestRail id strings are rendered only once, on first lookup. For each
+    set of split symbols (it depends on xUnit id string) index from group to
+    cases is built once and reused by all next lookups.
+    """
+
+    split_symbols_base = (r'a-zA-Z', r'\(\)', r'\[\]', r',', )
+
+    def __init__(self, cases, testrail_name_template, describe_case):
+        self.cases = cases
+        self.testrail_name_template = testrail_name_template
+        self.describe_case = describe_case
+        self._testrail_ids = None
+        self._indexes = {}
+
+    @classmethod
+    def get_split_symbols(cls, xunit_id):
+        """Return symbols groups, which is absent in xunit_id."""
         split_symbols = ''
-        for group in split_symbols_base:
+        for group in cls.split_symbols_base:
             if re.search(r'[{}]'.format(group), xunit_id) is None:
                 split_symbols += group
+        return split_symbols
 
-        split_expr = re.compile(r'[{}]'.format(split_symbols))\
-            if split_symbols else None
-        match_cases = []
-        for case in cases:
-            case_data = self.describe_testrail_case(case)
-            testrail_id = self.testrail_name_template.format(**case_data)
+    @property
+    def testrail_ids(self):
+        if self._testrail_ids is None:
+            self._testrail_ids = [
+                self.testrail_name_template.format(**self.describe_case(case))
+                for case in self.cases
+            ]
+        return self._testrail_ids
+
+    def _build_index(self, split_symbols):
+        index = defaultdict(list)
+        if not split_symbols:
+            for case, testrail_id in zip(self.cases, self.testrail_ids):
+                index[testrail_id].append(case)
+            return index
+
+        split_expr = re.compile(r'[{}]'.format(split_symbols))
+        for case, testrail_id in zip(self.cases, self.testrail_ids):
+            for group in split_expr.split(testrail_id):
+                if group:
+                    index[group].append(case)
+        return index
+
+    def lookup(self, xunit_id):
+        """Return all cases matched to xunit_id."""
+        split_symbols = self.get_split_symbols(xunit_id)
+        index = self._indexes.get(split_symbols)
+        if index is None:
+            index = self._indexes[split_symbols] = self._build_index(
+                split_symbols)
+        return list(index.get(xunit_id, ()))
+
+
+class SuiteRouter(object):
+    """Route xunit cases to testrail suites by id string prefix.
+
+    Case id string is made by `template` (with the same fields as xunit name
+    template). Case is routed to suite of the longest matched prefix or to
+    `default` suite.
+
+    :param routes: list of (prefix, suite name) pairs
+    """
+
+    def __init__(self, routes, default, template=u'{classname}'):
+        self.routes = sorted(routes, key=lambda x: len(x[0]), reverse=True)
+        self.default = default
+        self.template = template
 
-            if split_expr is None:
-                if xunit_id == testrail_id:
-                    match_cases.append(case)
-            else:
-                groups = [x for x in split_expr.split(testrail_id) if x]
-                groups.reverse()
-                for group in groups:
-                    if group == xunit_id:
-                        match_cases.append(case)
-        return match_cases
+    def route(self, xunit_case):
+        """Return suite name for xunit case."""
+        try:
+            name = self.template.format(**describe_xunit_case(xunit_case))
+        except NoneValueException:
+            return self.default
+        for prefix, suite in self.routes:
+            if name.startswith(prefix):
+                return suite
+        return self.default
+
+    def split(self, xunit_cases):
+        """Return suite name to xunit cases list map."""
+        suites = OrderedDict()
+        for xunit_case in xunit_cases:
+            suites.setdefault(self.route(xunit_case), []).append(xunit_case)
+        return suites
 
 
 def truncate_head(banner, text, max_len):
@@ -202,3 +342,113 @@ def truncate_head(banner, text, max_len):
         max_text_len -= len(start)
         text = start + text[-max_text_len:]
     return banner + text
+
+
+def expand_report_paths(paths):
+    """Return xUnit report files list from files, directories and globs.
+
+    Directories are searched recursively for `*.xml` files. Files found by
+    directory or glob are sorted, duplicates are dropped.
+    """
+    if isinstance(paths, six.string_types):
+        paths = [paths]
+    result = OrderedDict()
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for root, _, names in os.walk(path):
+                found.extend(os.path.join(root, x) for x in names
+                             if x.endswith('.xml'))
+        elif os.path.isfile(path):
+            found = [path]
+        else:
+            found = glob.glob(path)
+        for found_path in sorted(found):
+            result.setdefault(os.path.normpath(found_path), None)
+    return list(result)
+
+
+def _parse_report(path, max_output=None):
+    ts = xunitparser.TestSuite()
+    with open(path, 'rb') as f:
+        cases = list(xunitparser.iterparse(f, ts, max_output=max_output))
+    return cases, ts.properties, ts.time
+
+
+def merge_xunit_cases(cases_lists):
+    """Merge cases from many reports, dropping duplicates.
+
+    For cases with the same classname and methodname first one (in reports
+    order) is used, except skipped one, which is replaced by next not
+    skipped case.
+    """
+    merged = OrderedDict()
+    for cases in cases_lists:
+        for case in cases:
+            key = (case.classname, case.methodname)
+            prev = merged.get(key)
+            if prev is None or prev.skipped and not case.skipped:
+                merged[key] = case
+    return list(merged.values())
+
+
+def parse_xunit_reports(paths, workers=None, max_output=None,
+                        processes=True):
+    """Parse many xUnit reports in process pool into one suite.
+
+    Returns same (TestSuite, TestResult) pair as `xunitparser.parse`.
+    Only last `max_output` chars of cases stdout and stderr are kept.
+    With `processes` False reports are parsed in thread pool (for
+    multithreaded programs, where forking is not safe).
+    """
+    parse_report = functools.partial(_parse_report, max_output=max_output)
+    if len(paths) > 1 and workers != 1:
+        if processes:
+            from concurrent.futures import ProcessPoolExecutor as Executor
+        else:
+            from concurrent.futures import ThreadPoolExecutor as Executor
+        with Executor(max_workers=workers) as executor:
+            parsed = list(executor.map(parse_report, paths))
+    else:
+        parsed = [parse_report(x) for x in paths]
+
+    ts = xunitparser.TestSuite(merge_xunit_cases(x[0] for x in parsed))
+    logger.debug('Parsed {} cases from {} reports'.format(len(ts),
+                                                          len(paths)))
+    for _, properties, _ in parsed:
+        ts.properties.update(properties)
+    times = [x[2] for x in parsed if x[2] is not None]
+    if times:
+        ts.time = sum(times, timedelta())
+
+    tr = ts.run(xunitparser.TestResult())
+    tr.time = ts.time
+    return ts, tr
+
+
+def atomic_write(path, data):
+    """Write text `data` to file `path` atomically.
+
+    Data is written to temporary file in the same directory, which then
+    replaces `path`, so readers never see partially written file.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+        if hasattr(os, 'replace'):
+            os.replace(tmp_path, path)
+        else:
+            # Python 2 os.rename can't replace exists file on Windows
+            try:
+                os.rename(tmp_path, path)
+            except OSError:
+                os.remove(path)
+                os.rename(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise